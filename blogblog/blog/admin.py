@@ -126,6 +126,7 @@ class ContentAdmin(admin.ModelAdmin):
         - list_display (list): Specifies the fields to be displayed in the list view of the Content model.
         - readonly_fields (list): Specifies the fields that are read-only in the admin panel.
         - list_per_page (int): Specifies the number of items to display per page in the list view.
+        - list_select_related (list): Specifies the related objects fetched in the list view query.
 
     Returns:
         None
@@ -138,6 +139,7 @@ class ContentAdmin(admin.ModelAdmin):
                     'date_time_edit',
                     'author',
                     'is_published']
+    list_select_related = ['author__user']
     readonly_fields = ['slug']
     list_per_page = 20
 
@@ -153,6 +155,7 @@ class CommentAdmin(admin.ModelAdmin):
     Attributes:
         - list_display (list): Specifies the fields to be displayed in the list view of the Comment model.
         - list_per_page (int): Specifies the number of items to display per page in the list view.
+        - list_select_related (list): Specifies the related objects fetched in the list view query.
 
     Methods:
         - content_link(obj): Generates a link to the post that was commented on.
@@ -166,6 +169,7 @@ class CommentAdmin(admin.ModelAdmin):
                     'content_link',
                     'date_time_create']
     list_per_page = 40
+    list_select_related = ['author__user', 'content__author__user']
 
     def content_link(self, obj):
         """
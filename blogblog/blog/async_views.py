@@ -0,0 +1,188 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.middleware import get_user
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse, Http404
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import (aget_content_neighbours, aget_feed_version, aget_content_page, aset_content_page,
+                      get_content_state_key, CONTENT_STATE_TIMEOUT)
+from .pagination import CursorPaginator
+from .views import FeedView, SearchView, ContentView
+
+# Asynchronous versions of the read paths, served under ASGI when the ASYNC_VIEWS setting is on (see "blog/urls.py").
+# The queries are awaited with the async ORM, every queryset is evaluated before the template is rendered,
+# and the templates are rendered in the view, so Django does not render the response in a thread afterwards.
+# The cache is called through its async methods, so that a network cache (Redis) does not block the event loop.
+# The feed reads the versions of its cards and the cached cards ({% cache %} has no async version),
+# so its context is built and its template is rendered in a thread.
+
+
+async def aget_user(request):
+    """
+    Resolves the lazy `request.user` and replaces it with the loaded user.
+
+    Django 4.2 has no async API for sessions and authentication, so the user (usually cached,
+    see "blog/backends.py") is loaded in a thread once per request. Afterwards the templates and the views
+    can read `request.user` and `request.user.author` in the event loop.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        User: The user or AnonymousUser.
+    """
+
+    user = await sync_to_async(get_user)(request)
+    request.user = user
+    return user
+
+
+class AsyncAuthenticationRedirectMixin:
+    """
+    Mixin that loads the user before the sync AuthenticationRedirectMixin checks it, and awaits the handler.
+
+    Methods:
+        - dispatch(request, *args, **kwargs): Loads the user and dispatches the request.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        await aget_user(request)
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
+class AsyncFeedView(AsyncAuthenticationRedirectMixin, FeedView):
+    """
+    Asynchronous version of FeedView, including its AJAX "load more" responses.
+
+    The page is fetched asynchronously before the context is built, then the context of FeedView is reused.
+    The numbered 'page' pagination mode has no async paginator and is run in a thread.
+
+    Methods:
+        get(request, *args, **kwargs): Fetches the page and renders the feed in a thread.
+        apaginate_queryset(queryset, page_size): Fetches the page asynchronously.
+        paginate_queryset(queryset, page_size): Returns the page fetched by get().
+        render_to_response(context, **response_kwargs): Renders the feed in the view.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.pagination = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return await sync_to_async(self._render)()
+
+    def _render(self):
+        return self.render_to_response(self.get_context_data())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        Fetches the page of the feed asynchronously.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            page_size (int): The number of items per page.
+
+        Returns:
+            tuple: The paginator, the page, the list of objects of the page and the flag of pagination.
+
+        Raises:
+            Http404: If the cursor is invalid.
+        """
+
+        if self.pagination_mode != 'cursor':
+            return await sync_to_async(self._paginate_pages)(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.feed_ordering)
+        cursor = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg)
+        try:
+            page = await paginator.apage(cursor)
+        except InvalidPage as error:
+            raise Http404(f'Invalid page: {error}')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _paginate_pages(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = FeedView.paginate_queryset(self, queryset, page_size)
+        page.object_list = list(page.object_list)
+        return paginator, page, page.object_list, is_paginated
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.pagination
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return super().render_to_response(context, **response_kwargs)
+        return HttpResponse(render_to_string(self.get_template_names(), context, self.request))
+
+
+class AsyncSearchView(AsyncFeedView, SearchView):
+    """
+    Asynchronous version of SearchView: the results are fetched and rendered like the feed of AsyncFeedView.
+    """
+
+
+class AsyncContentView(AsyncAuthenticationRedirectMixin, ContentView):
+    """
+    Asynchronous version of ContentView.
+
+    Serves the same conditional responses and cached anonymous pages. Adding a comment writes to the database
+    through the signal handlers and runs the sync handler in a thread.
+
+    Methods:
+        get(request, *args, **kwargs): Handles the HTTP GET request with conditional GET and the page cache.
+        aget_content_state(): Asynchronous version of get_content_state().
+        arender_page(): Fetches the content, its comments and neighbours and renders the page.
+        post(request, *args, **kwargs): Handles the HTTP POST request for adding comments in a thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        state = await self.aget_content_state()
+        if state is None:
+            raise Http404('No content found matching the query')
+
+        etag = self.get_etag(state, await aget_feed_version())
+        last_modified = int(state['last_modified'].timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            if request.user.is_authenticated:
+                response = await self.arender_page()
+            else:
+                page = await aget_content_page(etag)
+                if page is None:
+                    response = await self.arender_page()
+                    await aset_content_page(etag, response.content)
+                else:
+                    response = HttpResponse(page)
+
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+    async def aget_content_state(self):
+        key = get_content_state_key(self.kwargs[self.slug_url_kwarg])
+        state = await cache.aget(key)
+        if state is None:
+            state = self.build_content_state(await self.get_content_state_queryset().afirst())
+            if state is None:
+                return None
+            await cache.aset(key, state, CONTENT_STATE_TIMEOUT)
+        return state
+
+    async def arender_page(self):
+        try:
+            self.object = await self.get_queryset().aget(slug=self.kwargs[self.slug_url_kwarg])
+        except self.model.DoesNotExist:
+            raise Http404('No content found matching the query')
+
+        context = super(ContentView, self).get_context_data(object=self.object)
+        context['comments'] = [comment async for comment in self.get_comments_queryset()]
+        context.update(self.get_page_context(await aget_content_neighbours(self.object)))
+        return HttpResponse(render_to_string(self.template_name, context, self.request))
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .caching import get_user_key, USER_TIMEOUT
+
+UserModel = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Authentication backend that caches the user loaded for every request.
+
+    The user is loaded together with the related author, so neither the authentication middleware
+    nor the `request.user.author` lookups in the views and templates query the database on a cache hit.
+    The cached user is removed by the signal handlers in "blog/signals.py" whenever the user or the author is saved,
+    so the password hash used to verify the session is never stale.
+
+    The removal only reaches the cache it is made in, so the user is cached only if the cache is shared by all
+    the processes of the server (the USER_CACHE setting, off for the local-memory cache). Otherwise another
+    process would keep accepting the sessions of a deactivated user or of an old password until the timeout.
+
+    Methods:
+        - get_user(user_id): Returns the active user with the given ID.
+    """
+
+    def get_user(self, user_id):
+        """
+        Returns the active user with the given ID, with the related author loaded.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            User: The user, or None if there is no active user with the given ID.
+        """
+
+        if not settings.USER_CACHE:
+            user = self.load_user(user_id)
+        else:
+            key = get_user_key(user_id)
+            user = cache.get(key)
+            if user is None:
+                user = self.load_user(user_id)
+                if user is not None:
+                    cache.set(key, user, USER_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    @staticmethod
+    def load_user(user_id):
+        """
+        Returns the user with the given ID and the related author from the database, or None.
+        """
+
+        try:
+            return UserModel._default_manager.select_related('author').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+
+
+class EmailBackend(CachedModelBackend):
+    """
+    Authentication backend that authenticates users by their email and password.
+
+    The user is found by the unique case-insensitive email index, in one query together with the related author
+    (which the login signal handlers update). The login form uses `get_user_by_email()` and checks the password
+    itself, so a login attempt costs one query and one password hash. The username credentials are left
+    to CachedModelBackend (the admin panel).
+
+    Methods:
+        - authenticate(request, email=None, password=None): Returns the active user with the email and password.
+        - get_user_by_email(email): Returns the user with the email.
+    """
+
+    def authenticate(self, request, email=None, password=None):
+        """
+        Returns the active user with the given email and password.
+
+        Args:
+            request (HttpRequest): The request, or None.
+            email (str): The email of the user, in any case.
+            password (str): The password of the user.
+
+        Returns:
+            User: The user, or None if the credentials are not valid.
+        """
+
+        if email is None or password is None:
+            return None
+        user = self.get_user_by_email(email)
+        if user is None:
+            # Run the password hasher once to reduce the timing difference
+            # between an existing and a nonexistent user (like ModelBackend does)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def get_user_by_email(email):
+        """
+        Returns the user with the given email, with the related author loaded.
+
+        Args:
+            email (str): The email of the user, in any case.
+
+        Returns:
+            User: The user, or None if there is no user with the email.
+        """
+
+        return UserModel.accounts.filter_by_email(email).select_related('author').order_by('pk').first()
@@ -0,0 +1,298 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache, caches
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+
+FEED_VERSION_KEY = 'blog:feed-version'
+NEIGHBOURS_TIMEOUT = 60 * 10
+CARD_TIMEOUT = 60 * 60 * 24
+CONTENT_PAGE_TIMEOUT = 60 * 10
+# The invalidation of a state reaches only the cache of the process that made the change if the cache is per process
+# (local memory); the other processes rebuild the state after this timeout
+CONTENT_STATE_TIMEOUT = 60 * 5
+USER_TIMEOUT = 60 * 15
+SUGGESTIONS_TIMEOUT = 60 * 10
+# Title suggestions are cached for the queries of up to this many characters
+SUGGESTIONS_CACHED_LENGTH = 3
+
+# Rendered HTML (feed cards and content pages) is kept apart from the small keys of the default cache,
+# so that large fragments cannot evict versions and states.
+fragment_cache = ConnectionProxy(caches, 'fragments')
+
+
+def get_feed_version():
+    """
+    Returns the current version of the published feed.
+
+    The version is a part of the cache keys of the data that depends on the whole feed, such as the previous
+    and the next articles. Changing the version makes all such cached data unreachable at once.
+
+    Returns:
+        int: The version of the feed.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(FEED_VERSION_KEY, version, None)
+        version = cache.get(FEED_VERSION_KEY, version)
+    return version
+
+
+async def aget_feed_version():
+    """
+    Asynchronous version of `get_feed_version()`.
+    """
+    version = await cache.aget(FEED_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(FEED_VERSION_KEY, version, None)
+        version = await cache.aget(FEED_VERSION_KEY, version)
+    return version
+
+
+def bump_feed_version():
+    """
+    Changes the version of the published feed, invalidating the cached data that depends on it.
+
+    Returns:
+        None
+    """
+    cache.set(FEED_VERSION_KEY, time.time_ns(), None)
+
+
+def get_content_neighbours(content):
+    """
+    Returns the previous and the next published articles of the content, cached per slug and feed version.
+
+    Args:
+        content (Content): The content.
+
+    Returns:
+        tuple: The previous and the next contents, None if there is no such content.
+    """
+    key = f'blog:neighbours:{get_feed_version()}:{content.slug}'
+    neighbours = cache.get(key)
+    if neighbours is None:
+        neighbours = content.get_neighbours()
+        cache.set(key, neighbours, NEIGHBOURS_TIMEOUT)
+    return neighbours
+
+
+async def aget_content_neighbours(content):
+    """
+    Asynchronous version of `get_content_neighbours()`.
+
+    The cache is called through its async methods, so that a network cache (Redis) does not block the event loop.
+    """
+    key = f'blog:neighbours:{await aget_feed_version()}:{content.slug}'
+    neighbours = await cache.aget(key)
+    if neighbours is None:
+        neighbours = await content.aget_neighbours()
+        await cache.aset(key, neighbours, NEIGHBOURS_TIMEOUT)
+    return neighbours
+
+
+def get_card_version_key(content_id):
+    """
+    Returns the cache key of the version of the feed card of the content.
+
+    Args:
+        content_id (int): The ID of the content.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'blog:card-version:{content_id}'
+
+
+def attach_card_versions(contents):
+    """
+    Sets the `card_version` attribute of every content to the version of its cached feed card.
+
+    The versions of the whole page are read from the cache in one request.
+    A content without a version gets a new one, so that no card cached before the version was lost can be reused.
+
+    Args:
+        contents (Iterable[Content]): The contents of a feed page.
+
+    Returns:
+        None
+    """
+    keys = {get_card_version_key(content.pk): content for content in contents}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    for key, content in keys.items():
+        content.card_version = versions[key]
+
+
+def bump_card_versions(*content_ids):
+    """
+    Changes the versions of the feed cards of the contents, invalidating their cached fragments.
+
+    Args:
+        *content_ids (int): The IDs of the contents.
+
+    Returns:
+        None
+    """
+    version = time.time_ns()
+    cache.set_many({get_card_version_key(content_id): version for content_id in content_ids}, None)
+
+
+def get_content_state_key(slug):
+    """
+    Returns the cache key of the state of the content that its HTTP validators are built from.
+
+    Args:
+        slug (str): The slug of the content.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'blog:content-state:{slug}'
+
+
+def invalidate_content_state(slug):
+    """
+    Removes the cached state of the content, so that its ETag and Last-Modified are rebuilt
+    and its cached pages become unreachable.
+
+    Args:
+        slug (str): The slug of the content.
+
+    Returns:
+        None
+    """
+    cache.delete(get_content_state_key(slug))
+
+
+def bump_content_states(*slugs):
+    """
+    Replaces the states of the contents with new ones, as if the contents were changed now.
+
+    Used when the pages show something that changed outside the contents and their comments, such as the name
+    of an author: the state built from the content again would have the old Last-Modified.
+    The ETags and Last-Modified of the pages change, and their cached pages become unreachable.
+
+    Args:
+        *slugs (str): The slugs of the contents.
+
+    Returns:
+        None
+    """
+    state = {'last_modified': timezone.now(), 'version': time.time_ns()}
+    cache.set_many({get_content_state_key(slug): state for slug in slugs}, CONTENT_STATE_TIMEOUT)
+
+
+def get_content_page_key(etag):
+    """
+    Returns the cache key of the rendered content page with the given ETag.
+
+    The ETag identifies the state of the content and everything else the page depends on,
+    so it is enough to address the cached page.
+
+    Args:
+        etag (str): The ETag of the page.
+
+    Returns:
+        str: The cache key.
+    """
+    return 'blog:content-page:' + etag.strip('"')
+
+
+def get_content_page(etag):
+    """
+    Returns the cached rendered content page with the given ETag.
+
+    Args:
+        etag (str): The ETag of the page.
+
+    Returns:
+        bytes: The rendered page, or None if it is not cached.
+    """
+    return fragment_cache.get(get_content_page_key(etag))
+
+
+def set_content_page(etag, page):
+    """
+    Caches the rendered content page with the given ETag.
+
+    Args:
+        etag (str): The ETag of the page.
+        page (bytes): The rendered page.
+
+    Returns:
+        None
+    """
+    fragment_cache.set(get_content_page_key(etag), page, CONTENT_PAGE_TIMEOUT)
+
+
+async def aget_content_page(etag):
+    """
+    Asynchronous version of `get_content_page()`.
+    """
+    return await fragment_cache.aget(get_content_page_key(etag))
+
+
+async def aset_content_page(etag, page):
+    """
+    Asynchronous version of `set_content_page()`.
+    """
+    await fragment_cache.aset(get_content_page_key(etag), page, CONTENT_PAGE_TIMEOUT)
+
+
+def get_user_key(user_id):
+    """
+    Returns the cache key of the user loaded by the authentication backend.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'blog:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """
+    Removes the cached user, so that the next request loads the user and their author from the database.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        None
+    """
+    cache.delete(get_user_key(user_id))
+
+
+def get_search_suggestions(query):
+    """
+    Returns the title suggestions for the query, cached for short queries per feed version.
+
+    The first characters typed are the most frequent queries and the most expensive ones: they match many titles,
+    and the trigram index does not help with less than three characters. Their suggestions are cached
+    until the feed changes; the longer queries are selective and answered by the index.
+
+    Args:
+        query (str): The typed query.
+
+    Returns:
+        list: Dicts with the 'title' and the 'slug' of the contents.
+    """
+    from .search import get_suggestions
+    query = query.strip().lower()
+    if len(query) > SUGGESTIONS_CACHED_LENGTH:
+        return get_suggestions(query)
+    key = f'blog:suggestions:{get_feed_version()}:{md5(query.encode(), usedforsecurity=False).hexdigest()}'
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = get_suggestions(query)
+        cache.set(key, suggestions, SUGGESTIONS_TIMEOUT)
+    return suggestions
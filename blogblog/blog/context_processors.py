@@ -1,9 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+
 def auth(request):
     """
     Context processor that provides information about the user's authentication status.
 
     This context processor adds a variable `user_authenticated` to the template context,
-    indicating whether the user is authenticated or not.
+    indicating whether the user is authenticated or not. The value is lazy, so the user is not loaded
+    for the pages that do not use it.
 
     Args:
         request (HttpRequest): The current HTTP request.
@@ -11,7 +15,7 @@ def auth(request):
     Returns:
         dict: A dictionary containing the `user_authenticated` variable.
     """
-    return {'user_authenticated': request.user.is_authenticated}
+    return {'user_authenticated': SimpleLazyObject(lambda: request.user.is_authenticated)}
 
 
 def canonical_url(request):
@@ -20,7 +24,7 @@ def canonical_url(request):
 
     This context processor adds a variable `canonical_path` to the template context,
     containing the canonical URL of the current page. The canonical URL is built using
-    the `build_absolute_uri()` method of the request object.
+    the `build_absolute_uri()` method of the request object when the template outputs it.
 
     Args:
         request (HttpRequest): The current HTTP request.
@@ -28,4 +32,4 @@ def canonical_url(request):
     Returns:
         dict: A dictionary containing the `canonical_path` variable.
     """
-    return {'canonical_path': request.build_absolute_uri(request.path)}
+    return {'canonical_path': SimpleLazyObject(lambda: request.build_absolute_uri(request.path))}
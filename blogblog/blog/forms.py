@@ -3,11 +3,16 @@ from collections import OrderedDict
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.models import User
+from django.db import connection, IntegrityError, transaction
 
+from .backends import EmailBackend
 from .helpers import to_latin
-from .models import Comment, Content, Author
+from .models import Comment, Content, Author, get_next_username_number
 from .validators import phone_validator
 
+# The number of attempts to insert a new user with a drawn username number, see UserSignUpForm.save_user()
+USERNAME_ATTEMPTS = 3
+
 
 class LowercaseEmailMixin:
     """
@@ -28,13 +33,37 @@ class LowercaseEmailMixin:
         return email.lower()
 
 
-class AdminUserCreationForm(LowercaseEmailMixin, UserCreationForm):
+class UniqueEmailMixin(LowercaseEmailMixin):
+    """
+    Mixin for forms that create users: the email must not belong to another user in any case.
+
+    The check uses the same case-insensitive lookup as the unique index on LOWER(email), so a duplicate
+    is reported as a form error instead of failing on the index when the user is saved.
+    """
+
+    def clean_email(self):
+        """
+        Converts the email to lowercase and checks that no user has it.
+
+        Returns:
+            str: The lowercase version of the email.
+
+        Raises:
+            forms.ValidationError: If a user with the email already exists.
+        """
+        email = super().clean_email()
+        if User.accounts.filter_by_email(email).exists():
+            raise forms.ValidationError('User with this email already exists.')
+        return email
+
+
+class AdminUserCreationForm(UniqueEmailMixin, UserCreationForm):
     """
     A custom user creation form for the admin panel.
     This is necessary because the base User model is extended by the Author model.
 
     This form extends the default `UserCreationForm` and adds additional fields and functionality.
-    It includes the `LowercaseEmailMixin` to ensure that the email is always stored in lowercase.
+    It includes the `UniqueEmailMixin` to ensure that the email is always stored in lowercase and is unique.
 
     Attributes:
         email (forms.EmailField): The email field for the user. Required.
@@ -77,7 +106,7 @@ class AdminUserCreationForm(LowercaseEmailMixin, UserCreationForm):
         )
 
 
-class UserSignUpForm(LowercaseEmailMixin, UserCreationForm):
+class UserSignUpForm(UniqueEmailMixin, UserCreationForm):
     """
     A form for user sign-up, based on UserCreationForm with additional fields and validation.
 
@@ -107,6 +136,8 @@ class UserSignUpForm(LowercaseEmailMixin, UserCreationForm):
             Overrides the default save method to include additional processing steps,
             such as setting the email, generating a username, and saving the user.
 
+        save_user(self, user): Generates the username and inserts the user.
+
     """
     first_name = forms.CharField(
         required=True,
@@ -178,30 +209,50 @@ class UserSignUpForm(LowercaseEmailMixin, UserCreationForm):
 
         When a new user is saved in the database, an entry in the Author table will appear automatically.
         The create_author(post_save) function for this is written in the "blog/signal.py".
+        The number of the username is drawn only for a user that is saved (see save_user()), so a form
+        saved with commit=False does not use up a number; such a user is saved later with save_user().
 
         Args:
             commit (bool, optional): Determines whether to save the user to the database. Defaults to True.
 
         Returns:
-            User: The saved user instance.
+            User: The user instance, saved if `commit` is True.
         """
 
         user = super().save(commit=False)
         user.email = self.cleaned_data['email']
-
         if commit:
-            user.save()
+            self.save_user(user)
+        return user
 
-        first_name = to_latin(self.cleaned_data['first_name'])
-        last_name = to_latin(self.cleaned_data['last_name'])
+    def save_user(self, user):
+        """
+        Generates the username and inserts the user, in one transaction with their author.
 
-        username = f"{first_name}-{last_name}-{user.id + 100001}"
-        user.username = username.lower()
+        The number of the username is known before the user is inserted (see get_next_username_number()),
+        so the user is inserted once. The number from the PostgreSQL sequence is unique; the fallback of
+        the other databases may give two concurrent signups the same number, so the insert is then retried
+        with a new one.
 
-        if commit:
-            user.save()
+        Args:
+            user (User): The unsaved user.
 
-        return user
+        Returns:
+            User: The saved user.
+        """
+
+        first_name = to_latin(self.cleaned_data['first_name'])
+        last_name = to_latin(self.cleaned_data['last_name'])
+        for attempt in range(1, USERNAME_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    user.username = f"{first_name}-{last_name}-{get_next_username_number()}".lower()
+                    user.save()
+            except IntegrityError:
+                if connection.vendor == 'postgresql' or attempt == USERNAME_ATTEMPTS:
+                    raise
+            else:
+                return user
 
 
 class UserLogInForm(LowercaseEmailMixin, AuthenticationForm):
@@ -244,6 +295,8 @@ class UserLogInForm(LowercaseEmailMixin, AuthenticationForm):
         """
         Validates the email field and checks if a user with the provided email exists and is active.
 
+        The user is looked up once, by EmailBackend, and kept for clean_password() and the login.
+
         Returns:
             str: Validated email value.
 
@@ -251,13 +304,13 @@ class UserLogInForm(LowercaseEmailMixin, AuthenticationForm):
             forms.ValidationError: If the email is not found or is inactive.
         """
 
-        email = self.cleaned_data.get('email')
-        try:
-            self.user_cache = User.objects.get(email=email)
-        except User.DoesNotExist:
+        email = super().clean_email()
+        backend = EmailBackend()
+        self.user_cache = backend.get_user_by_email(email)
+        if self.user_cache is None:
             raise forms.ValidationError("User with this email was not found")
 
-        if self.user_cache and not self.user_cache.is_active:
+        if not backend.user_can_authenticate(self.user_cache):
             raise forms.ValidationError("Email is inactive")
 
         return email
@@ -266,6 +319,8 @@ class UserLogInForm(LowercaseEmailMixin, AuthenticationForm):
         """
         Validates the password field and checks if the entered password is correct.
 
+        This is the only password hash of the login: the view logs the user in without authenticating again.
+
         Returns:
             str: Validated password value.
 
@@ -1,3 +1,4 @@
+from bs4 import BeautifulSoup
 from unidecode import unidecode
 
 
@@ -21,3 +22,37 @@ def to_latin(string, replace_char=''):
         for char in transliterated
     )
     return latin_string
+
+
+def html_to_text(html):
+    """
+    Converts an HTML fragment to plain text.
+
+    The BeautifulSoup parser is used to remove tags, the text of neighbouring elements is separated by a space.
+
+    Args:
+        html (str): The HTML fragment.
+
+    Returns:
+        str: The plain text of the fragment.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.get_text(separator=' ')
+
+
+def truncate_text(text, length):
+    """
+    Shortens the text to the specified length.
+
+    If the text is longer than the specified length, it is cut and an ellipsis is appended.
+
+    Args:
+        text (str): The text to shorten.
+        length (int): The desired length of the shortened text.
+
+    Returns:
+        str: Shortened text.
+    """
+    if len(text) > length:
+        return f'{text[:length]}...'
+    return text
@@ -0,0 +1,408 @@
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages.storage import default_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import reverse, resolve, Resolver404
+from django.utils.module_loading import import_string
+
+from blog.views import FeedView
+
+PAGE_TEMPLATE = 'blog/feed.html'
+FRAGMENT_TEMPLATE = 'blog/includes/partial_feed.html'
+
+
+def read_memory(pid):
+    """
+    Returns the RSS, PSS and shared memory of the process in megabytes, or None if it cannot be read.
+
+    Args:
+        pid (int): The process ID.
+
+    Returns:
+        dict: 'rss', 'pss' and 'shared' in megabytes.
+    """
+
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared'}
+    usage = dict.fromkeys(fields.values(), 0.0)
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    usage[fields[name]] += int(value.split()[0]) / 1024
+    except OSError:
+        return None
+    return usage
+
+
+def get_children(pid):
+    """
+    Returns the IDs of the child processes of the process (Linux only).
+    """
+
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+
+class Command(BaseCommand):
+    """
+    Management command that runs the performance benchmarks of the project.
+
+    Targets:
+        - startup: Starts gunicorn with the configuration from "gunicorn.conf.py" and measures the time until
+          the first response and until all the workers have booted, and the memory of the master and the workers.
+          Run it with different GUNICORN_PROFILE values and with --no-preload to see what preloading saves.
+        - render: Renders the first page of the feed for the first author and measures the time per render
+          of the full page and of the AJAX fragment with the uncached and the cached template loaders,
+          and of the fragment with and without the context processors. The database is queried once,
+          so only the template work is measured.
+        - middleware: Passes requests through the middleware of the MIDDLEWARE setting to a view that returns
+          an empty response and measures the time per request added by every middleware, for a page and for
+          an AJAX request with a trailing slash, and the time of a URL resolve() for comparison.
+
+    Usage:
+        python manage.py benchmark startup [--profile PROFILE] [--workers N] [--no-preload] [--runs N]
+        python manage.py benchmark render [--renders N] [--runs N]
+        python manage.py benchmark middleware [--path PATH] [--requests N] [--runs N]
+    """
+
+    help = 'Runs a performance benchmark of the project.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target',
+            choices=['startup', 'render', 'middleware'],
+            help='The benchmark to run.'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='The number of runs; the median is reported.'
+        )
+        startup = parser.add_argument_group('startup')
+        startup.add_argument(
+            '--profile',
+            default=os.environ.get('GUNICORN_PROFILE', 'cpu-bound'),
+            help='The gunicorn profile (cpu-bound, io-bound or low-memory).'
+        )
+        startup.add_argument(
+            '--workers',
+            type=int,
+            help='Override the number of workers of the profile.'
+        )
+        startup.add_argument(
+            '--no-preload',
+            action='store_true',
+            help='Do not preload the application in the master.'
+        )
+        startup.add_argument(
+            '--path',
+            default='/about',
+            help='The path requested to detect that the server is ready, or passed through the middleware.'
+        )
+        startup.add_argument(
+            '--timeout',
+            type=float,
+            default=60.0,
+            help='Seconds to wait for the server to boot.'
+        )
+
+        render = parser.add_argument_group('render')
+        render.add_argument(
+            '--renders',
+            type=int,
+            default=200,
+            help='The number of renders of each variant per run.'
+        )
+
+        middleware = parser.add_argument_group('middleware')
+        middleware.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='The number of requests of each kind per repeat; the best of 3 repeats is taken in every run.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Runs the benchmark of the given target and reports the medians of the runs.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+        """
+
+        benchmark = getattr(self, f'benchmark_{options["target"]}')
+        results = [benchmark(options) for _ in range(options['runs'])]
+        for name in results[0]:
+            values = [result[name] for result in results if result[name] is not None]
+            median = f'{statistics.median(values):.2f}' if values else 'n/a'
+            self.stdout.write(f'{name:<36} {median}')
+
+    def benchmark_startup(self, options):
+        """
+        Starts gunicorn once and measures its boot.
+
+        Args:
+            options (dict): Command options.
+
+        Returns:
+            dict: The measurements: times in seconds and memory in megabytes.
+
+        Raises:
+            CommandError: If gunicorn does not boot in time.
+        """
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        env = dict(
+            os.environ,
+            GUNICORN_PROFILE=options['profile'],
+            GUNICORN_PRELOAD='0' if options['no_preload'] else '1',
+            GUNICORN_BIND=f'127.0.0.1:{port}',
+        )
+        if options['workers']:
+            env['GUNICORN_WORKERS'] = str(options['workers'])
+
+        url = f'http://127.0.0.1:{port}{options["path"]}'
+        with tempfile.TemporaryFile('w+') as log:
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn'],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+            try:
+                first_response = self.wait_for_response(url, process, started + options['timeout']) - started
+                all_booted = self.wait_for_workers(log, process, started + options['timeout']) - started
+                memory = {pid: read_memory(pid) for pid in [process.pid] + get_children(process.pid)}
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=30)
+
+        master = memory.pop(process.pid)
+        workers = [usage for usage in memory.values() if usage]
+        self.stderr.write(
+            f'run: first response {first_response:.2f} s, all workers booted {all_booted:.2f} s, {len(workers)} workers'
+        )
+        average = (lambda name: statistics.mean(usage[name] for usage in workers)) if workers else (lambda name: None)
+        return {
+            'first response, s': first_response,
+            'all workers booted, s': all_booted,
+            'master rss, MB': master and master['rss'],
+            'worker rss (mean), MB': average('rss'),
+            'worker pss (mean), MB': average('pss'),
+            'worker shared (mean), MB': average('shared'),
+            'total pss, MB': master and master['pss'] + sum(usage['pss'] for usage in workers),
+        }
+
+    def benchmark_render(self, options):
+        """
+        Renders the feed page and its AJAX fragment in several variants and measures the time per render.
+
+        Args:
+            options (dict): Command options.
+
+        Returns:
+            dict: The milliseconds per render of every variant.
+        """
+
+        if not hasattr(self, 'render_setup'):
+            self.render_setup = self.get_render_setup()
+        request, context = self.render_setup
+
+        template = settings.TEMPLATES[0]
+        uncached = DjangoTemplates({
+            'NAME': 'uncached',
+            'DIRS': template['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': {
+                **{name: value for name, value in template['OPTIONS'].items() if name != 'loaders'},
+                'loaders': [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            },
+        })
+        cached = engines[template.get('NAME', 'django')]
+        fragment = {**context, 'request': request}
+
+        variants = {
+            'page, uncached loader': lambda: uncached.get_template(PAGE_TEMPLATE).render(context, request),
+            'page, cached loader': lambda: cached.get_template(PAGE_TEMPLATE).render(context, request),
+            'fragment, uncached loader': lambda: uncached.get_template(FRAGMENT_TEMPLATE).render(fragment),
+            'fragment + context processors': lambda: cached.get_template(FRAGMENT_TEMPLATE).render(context, request),
+            'fragment, cached loader': lambda: cached.get_template(FRAGMENT_TEMPLATE).render(fragment),
+        }
+        results = {}
+        for name, render in variants.items():
+            render()
+            started = time.perf_counter()
+            for _ in range(options['renders']):
+                render()
+            results[f'{name}, ms'] = (time.perf_counter() - started) * 1000 / options['renders']
+        return results
+
+    def get_render_setup(self):
+        """
+        Builds the request of the first author for the feed and the context of the feed page.
+
+        Returns:
+            tuple: The request and the context.
+
+        Raises:
+            CommandError: If there is no author.
+        """
+
+        user = User.objects.filter(author__isnull=False).select_related('author').first()
+        if user is None:
+            raise CommandError('The render benchmark needs at least one author.')
+        request = RequestFactory().get(reverse('feed'))
+        request.user = user
+        request.session = {}
+        request._messages = default_storage(request)
+
+        view = FeedView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        context['contents'] = list(context['contents'])
+        return request, context
+
+    def benchmark_middleware(self, options):
+        """
+        Measures the time per request added by every middleware.
+
+        The chain of the first N middleware is timed for N from 0 to all, and the time of each middleware
+        is the difference between the chains with and without it. The views are not called through the URL
+        resolver, so process_view() hooks are not run.
+
+        Args:
+            options (dict): Command options.
+
+        Returns:
+            dict: The microseconds per request of the chain and of every middleware, and of a resolve().
+        """
+
+        path = options['path']
+        factory = RequestFactory()
+        kinds = {
+            'page': lambda: factory.get(path),
+            'ajax/': lambda: factory.get(f'{path.rstrip("/")}/', headers={'X-Requested-With': 'XMLHttpRequest'}),
+        }
+        paths = []
+        for middleware_path in settings.MIDDLEWARE:
+            try:
+                import_string(middleware_path)(lambda request: HttpResponse())
+            except MiddlewareNotUsed:
+                continue
+            paths.append(middleware_path)
+
+        results = {}
+        for kind, make_request in kinds.items():
+            previous = None
+            for count in range(len(paths) + 1):
+                elapsed = self.time_requests(self.build_chain(paths[:count]), make_request, options['requests'])
+                if count:
+                    results[f'{kind}: {paths[count - 1].rsplit(".", 1)[1]}, us'] = elapsed - previous
+                else:
+                    base = elapsed
+                previous = elapsed
+            results[f'{kind}: all middleware, us'] = previous - base
+
+        requests = [factory.get(path) for _ in range(options['requests'])]
+        started = time.perf_counter()
+        for request in requests:
+            try:
+                resolve(request.path_info)
+            except Resolver404:
+                pass
+        results['resolve(), us'] = (time.perf_counter() - started) * 1e6 / options['requests']
+        return results
+
+    @staticmethod
+    def build_chain(paths):
+        """
+        Wraps a view that returns an empty response in the middleware, the first one outermost.
+        """
+
+        handler = lambda request: HttpResponse()
+        for path in reversed(paths):
+            handler = import_string(path)(handler)
+        return handler
+
+    @staticmethod
+    def time_requests(handler, make_request, count, repeats=3):
+        """
+        Returns the microseconds per request of the handler, the best of the repeats like timeit does.
+        The requests are built before the timing.
+        """
+
+        handler(make_request())
+        best = None
+        for _ in range(repeats):
+            requests = [make_request() for _ in range(count)]
+            started = time.perf_counter()
+            for request in requests:
+                handler(request)
+            elapsed = (time.perf_counter() - started) * 1e6 / count
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def wait_for_response(self, url, process, deadline):
+        """
+        Polls the URL until the server responds and returns the time of the first response.
+        """
+
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'gunicorn exited with the code {process.returncode}')
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return time.perf_counter()
+            except urllib.error.HTTPError:
+                return time.perf_counter()
+            except OSError:
+                time.sleep(0.01)
+        raise CommandError(f'No response from {url}')
+
+    def wait_for_workers(self, log, process, deadline):
+        """
+        Reads the gunicorn log until every worker reports that it has booted, and returns the time of the last one.
+        """
+
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'gunicorn exited with the code {process.returncode}')
+            log.seek(0)
+            text = log.read()
+            expected = re.search(r'Profile \S+: (\d+) ', text)
+            if expected and len(re.findall(r'Worker \d+ booted', text)) >= int(expected.group(1)):
+                return time.perf_counter()
+            time.sleep(0.01)
+        raise CommandError('The workers did not boot in time')
@@ -0,0 +1,122 @@
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.management.base import BaseCommand, CommandError
+
+from blogblog.caches import CountingCacheMixin
+
+
+class Command(BaseCommand):
+    """
+    Management command that checks the health of the configured caches.
+
+    Every named cache from the CACHES setting is probed with a set/get/delete/get round trip.
+    The backend, the probe latency and the hit/miss statistics are reported. The hits and the misses are counted
+    by the cache backends of the project (see blogblog/caches.py) for every backend; in addition Redis reports its
+    server-wide keyspace hits and misses, and the local-memory and file-based backends the number of stored entries.
+
+    Usage:
+        python manage.py cache_health [--alias ALIAS]
+    """
+
+    help = 'Probes the configured caches and reports their latency and hit/miss statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias',
+            action='append',
+            help='The name of the cache to check. Can be repeated. All the caches are checked by default.'
+        )
+
+    def probe(self, cache):
+        """
+        Writes, reads and deletes a unique key, and checks that it is gone, which counts one hit and one miss.
+
+        Args:
+            cache (BaseCache): The cache to probe.
+
+        Returns:
+            float: The duration of the round trip in milliseconds.
+
+        Raises:
+            CommandError: If the written value cannot be read back.
+        """
+
+        key = f'health:{uuid.uuid4().hex}'
+        started = time.perf_counter()
+        cache.set(key, key, 10)
+        value = cache.get(key)
+        cache.delete(key)
+        deleted = cache.get(key) is None
+        duration = (time.perf_counter() - started) * 1000
+        if value != key:
+            raise CommandError('The written value was not read back')
+        if not deleted:
+            raise CommandError('The deleted value was read back')
+        return duration
+
+    def get_statistics(self, cache):
+        """
+        Returns the statistics that the cache backend provides.
+
+        Args:
+            cache (BaseCache): The cache.
+
+        Returns:
+            str: The description of the statistics.
+        """
+
+        statistics = []
+        if isinstance(cache, CountingCacheMixin):
+            stats = cache.get_stats()
+            hits, misses = stats['hits'], stats['misses']
+            ratio = hits / (hits + misses) if hits + misses else 0
+            statistics.append(f'hits={hits} misses={misses} hit_ratio={ratio:.1%}')
+        if isinstance(cache, RedisCache):
+            info = cache._cache.get_client().info('stats')
+            statistics.append(
+                f"server keyspace_hits={info.get('keyspace_hits', 0)} keyspace_misses={info.get('keyspace_misses', 0)}"
+            )
+        elif isinstance(cache, LocMemCache):
+            statistics.append(f'entries={len(cache._cache)} (this process only)')
+        elif isinstance(cache, FileBasedCache):
+            entries = len([name for name in os.listdir(cache._dir) if name.endswith(cache.cache_suffix)])
+            statistics.append(f'entries={entries}')
+        return ', '.join(statistics) or 'not available'
+
+    def handle(self, *args, **options):
+        """
+        Probes the caches and reports the results.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+
+        Raises:
+            CommandError: If some of the caches is not available.
+        """
+
+        failures = []
+        for alias in options['alias'] or settings.CACHES:
+            cache = caches[alias]
+            try:
+                duration = self.probe(cache)
+                statistics = self.get_statistics(cache)
+            except Exception as error:
+                failures.append(alias)
+                self.stderr.write(f'{alias}: {type(cache).__name__} FAILED: {error}')
+                continue
+            self.stdout.write(f'{alias}: {type(cache).__name__} OK, round trip {duration:.2f} ms, {statistics}')
+
+        if failures:
+            raise CommandError(f'Unavailable caches: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All caches are available.'))
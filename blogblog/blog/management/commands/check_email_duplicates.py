@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Management command that finds the emails used by more than one user, compared case-insensitively.
+
+    Such users prevent the unique index on LOWER(email) from being created (migration blog.0009), and only one
+    of them can log in. Every duplicate is listed with its users, so they can be merged or their emails changed
+    in the admin panel before migrating. The command fails if there are duplicates, so it can be run
+    as a deployment check.
+
+    Usage:
+        python manage.py check_email_duplicates
+    """
+
+    help = 'Lists the emails that are used by more than one user regardless of case.'
+
+    def handle(self, *args, **options):
+        """
+        Finds and lists the duplicate emails.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+
+        Raises:
+            CommandError: If there are duplicate emails.
+        """
+
+        duplicates = list(User.accounts.get_email_duplicates())
+        if not duplicates:
+            self.stdout.write(self.style.SUCCESS('No duplicate emails.'))
+            return
+
+        for duplicate in duplicates:
+            self.stdout.write(f'{duplicate["email_lower"]} ({duplicate["count"]} users):')
+            users = User.accounts.filter_by_email(duplicate['email_lower']).order_by('pk')
+            for user in users.only('username', 'email', 'is_active', 'last_login', 'date_joined'):
+                last_login = user.last_login.isoformat(timespec='seconds') if user.last_login else 'never'
+                self.stdout.write(
+                    f'    id {user.pk}, {user.username}, {user.email}, active: {user.is_active}, '
+                    f'joined {user.date_joined.isoformat(timespec="seconds")}, last login {last_login}'
+                )
+        raise CommandError(f'{len(duplicates)} emails are used by more than one user.')
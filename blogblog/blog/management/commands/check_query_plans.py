@@ -0,0 +1,137 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.models import Content, Comment, Author
+from blog.pagination import CursorPaginator
+from blog.search import search_contents, get_suggestions_queryset
+from blog.views import FeedView
+
+
+def has_index_condition(plan, index):
+    """
+    Returns True if the plan scans the index with an Index Cond, i.e. seeks in the index.
+
+    The details of a plan node (Index Cond, Filter, ...) are listed on the lines after the node,
+    up to the next node, which starts with '->'.
+
+    Args:
+        plan (str): The text of the query plan.
+        index (str): The name of the index.
+
+    Returns:
+        bool: True if a scan of the index has an Index Cond.
+    """
+
+    lines = plan.splitlines()
+    for number, line in enumerate(lines):
+        if index not in line:
+            continue
+        for detail in lines[number + 1:]:
+            if '->' in detail:
+                break
+            if 'Index Cond' in detail:
+                return True
+    return False
+
+
+class Command(BaseCommand):
+    """
+    Management command that checks the query plans of the hot feed, search, suggestion and login queries on PostgreSQL.
+
+    Every query is explained with sequential scans disabled for the transaction, so the planner picks an index
+    whenever a usable one exists, regardless of the size of the tables. The check fails if a query still scans
+    a table sequentially, does not use the expected index or only filters the rows of an index it should seek in,
+    which means that a change of a query or a migration has made the index unusable.
+
+    Usage:
+        python manage.py check_query_plans [--verbose-plans]
+    """
+
+    help = 'Checks that the feed, search and login queries use their indexes instead of sequential scans (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the query plans.'
+        )
+
+    def get_queries(self):
+        """
+        Returns the checked queries with the names of the indexes they are expected to use.
+
+        A query that seeks (has a condition the index can serve, such as the cursor of the next page) must use
+        the index with an Index Cond: an index scan that only filters the rows reads the index from its start.
+
+        Returns:
+            list: Tuples of the query name, the queryset, the expected index name and the flag of seeking.
+        """
+
+        now = timezone.now()
+        feed = FeedView().get_queryset()
+        paginator = CursorPaginator(feed, FeedView.paginate_by, FeedView.feed_ordering)
+        cursor = paginator.encode_cursor(Content(id=1, date_time_create=now))
+        author = Author(id=1)
+        prev_queryset, next_queryset = Content(date_time_create=now).get_neighbour_querysets()
+
+        return [
+            ('feed first page', paginator.get_page_queryset(), 'content_published_feed_idx', False),
+            ('feed next page', paginator.get_page_queryset(cursor), 'content_published_feed_idx', True),
+            ('previous article', prev_queryset, 'content_published_feed_idx', True),
+            ('next article', next_queryset, 'content_published_feed_idx', True),
+            ('author feed',
+             Content.objects.filter(author=author).order_by(*FeedView.feed_ordering)[:FeedView.paginate_by + 1],
+             'content_author_feed_idx', True),
+            ('article comments',
+             Comment.objects.filter(content_id=1).order_by('date_time_create'),
+             'comment_content_created_idx', True),
+            ('search',
+             search_contents(Content.objects.filter(is_published=True), 'blog')[:FeedView.paginate_by + 1],
+             'content_search_vector_idx', True),
+            ('title suggestions',
+             get_suggestions_queryset('blog'),
+             'content_title_trgm_idx', True),
+            ('user by email',
+             User.accounts.filter_by_email('user@example.com').select_related('author'),
+             'auth_user_email_lower_uniq', True),
+        ]
+
+    def handle(self, *args, **options):
+        """
+        Explains the checked queries and reports the ones that do not use their indexes.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+
+        Raises:
+            CommandError: If the database is not PostgreSQL or some query does not use its index.
+        """
+
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans can only be checked on PostgreSQL.')
+
+        failures = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset, index, seek in self.get_queries():
+                plan = queryset.explain()
+                if options['verbose_plans']:
+                    self.stdout.write(f'{name}:\n{plan}\n')
+                if 'Seq Scan' in plan or index not in plan:
+                    failures.append(f'{name}: expected {index}\n{plan}')
+                elif seek and not has_index_condition(plan, index):
+                    failures.append(f'{name}: expected an Index Cond on {index}, not only a Filter\n{plan}')
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Queries without index scans:\n\n' + '\n\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All checked queries use their indexes.'))
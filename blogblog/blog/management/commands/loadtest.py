@@ -0,0 +1,196 @@
+import http.client
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Management command that load-tests a running server with concurrent GET requests.
+
+    Every client keeps its own persistent connection and requests the given URLs in turn, like a browser
+    reading the feed and the articles. The throughput, the latency percentiles and the status codes are reported,
+    so the WSGI and the ASGI deployments can be compared by running the command against each of them
+    with the same arguments (see README).
+
+    The client is a pool of threads: run it on another machine or keep an eye on its CPU usage,
+    otherwise the client itself becomes the bottleneck.
+
+    Usage:
+        python manage.py loadtest URL [URL ...] [--concurrency N] [--duration SECONDS] [--cookie NAME=VALUE]
+    """
+
+    help = 'Sends concurrent GET requests to a running server and reports the throughput and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='The URLs to request in turn, e.g. http://127.0.0.1:8000/feed'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help='The number of concurrent clients.'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10.0,
+            help='The duration of the test in seconds.'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=float,
+            default=1.0,
+            help='Seconds of requests that are not measured, to fill the caches and open the connections.'
+        )
+        parser.add_argument(
+            '--cookie',
+            action='append',
+            default=[],
+            help='A cookie sent with every request, e.g. sessionid=... for an authenticated user. Can be repeated.'
+        )
+        parser.add_argument(
+            '--header',
+            action='append',
+            default=[],
+            help='A header sent with every request, e.g. "X-Requested-With: XMLHttpRequest". Can be repeated.'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='The timeout of a request in seconds.'
+        )
+
+    def get_headers(self, options):
+        """
+        Builds the headers sent with every request.
+
+        Args:
+            options (dict): Command options.
+
+        Returns:
+            dict: The headers.
+
+        Raises:
+            CommandError: If a header is malformed.
+        """
+
+        headers = {}
+        for header in options['header']:
+            name, separator, value = header.partition(':')
+            if not separator:
+                raise CommandError(f'Malformed header: {header}')
+            headers[name.strip()] = value.strip()
+        if options['cookie']:
+            headers['Cookie'] = '; '.join(options['cookie'])
+        return headers
+
+    def run_client(self, targets, headers, timeout, measure_from, deadline, offset):
+        """
+        Requests the targets in turn until the deadline over one persistent connection.
+
+        Args:
+            targets (list): Tuples of the scheme, the host and port, and the path with the query.
+            headers (dict): The headers of the requests.
+            timeout (float): The timeout of a request in seconds.
+            measure_from (float): The time from which the requests are measured.
+            deadline (float): The time at which the client stops.
+            offset (int): The index of the first target, so that the clients do not request the same URL at once.
+
+        Returns:
+            tuple: The latencies in seconds and the counter of the status codes and errors.
+        """
+
+        latencies = []
+        statuses = Counter()
+        connections = {}
+        number = offset
+        while time.perf_counter() < deadline:
+            scheme, netloc, path = targets[number % len(targets)]
+            number += 1
+            connection = connections.get(netloc)
+            if connection is None:
+                connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+                connection = connections[netloc] = connection_class(netloc, timeout=timeout)
+
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as error:
+                connection.close()
+                del connections[netloc]
+                status = type(error).__name__
+            if started >= measure_from:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+        for connection in connections.values():
+            connection.close()
+        return latencies, statuses
+
+    def handle(self, *args, **options):
+        """
+        Runs the load test and reports the results.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+
+        Raises:
+            CommandError: If a URL is not an HTTP(S) URL.
+        """
+
+        targets = []
+        for url in options['urls']:
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.netloc:
+                raise CommandError(f'Not an HTTP URL: {url}')
+            path = parts.path or '/'
+            if parts.query:
+                path = f'{path}?{parts.query}'
+            targets.append((parts.scheme, parts.netloc, path))
+
+        headers = self.get_headers(options)
+        concurrency = options['concurrency']
+        measure_from = time.perf_counter() + options['warmup']
+        deadline = measure_from + options['duration']
+
+        self.stdout.write(
+            f'{concurrency} clients, {options["duration"]:.0f} s (+{options["warmup"]:.0f} s warm-up), '
+            f'{len(targets)} URLs'
+        )
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(self.run_client, targets, headers, options['timeout'], measure_from, deadline, offset)
+                for offset in range(concurrency)
+            ]
+            results = [future.result() for future in futures]
+
+        latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+        statuses = sum((client_statuses for _, client_statuses in results), Counter())
+        if len(latencies) < 2:
+            raise CommandError('Too few requests were completed to report the results.')
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(f'requests:   {len(latencies)} ({len(latencies) / options["duration"]:.1f} per second)')
+        self.stdout.write(
+            f'latency ms: mean {statistics.mean(latencies) * 1000:.1f}, p50 {percentiles[49] * 1000:.1f}, '
+            f'p90 {percentiles[89] * 1000:.1f}, p99 {percentiles[98] * 1000:.1f}, max {latencies[-1] * 1000:.1f}'
+        )
+        self.stdout.write('responses:  ' + ', '.join(f'{status}: {count}' for status, count in sorted(
+            statuses.items(), key=lambda item: str(item[0])
+        )))
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+
+from blog.caching import bump_card_versions
+from blog.models import Content
+from blog.search import get_search_vector, is_full_text_search_supported
+
+
+class Command(BaseCommand):
+    """
+    Management command that builds the stored plain text, excerpt and search vector of existing articles.
+
+    Articles are processed in batches ordered by primary key, each batch is written with a single bulk update
+    (and, on PostgreSQL, one more UPDATE of the search vectors). The cached feed cards of the updated articles
+    are invalidated after every batch, so the feed shows the new excerpts.
+    By default, only articles without an excerpt are processed.
+
+    Usage:
+        python manage.py rebuild_excerpts [--batch-size N] [--all]
+    """
+
+    help = 'Builds the stored plain text, excerpt and search vector of existing articles in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of articles processed per batch.'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild the excerpt of every article, not only of the articles without one.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Builds the excerpts batch by batch and reports the number of updated articles.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+        """
+
+        batch_size = options['batch_size']
+        queryset = Content.objects.only('pk', 'text').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(excerpt='')
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for content in batch:
+                content.build_excerpt()
+            content_ids = [content.pk for content in batch]
+            Content.objects.bulk_update(batch, ['plain_text', 'excerpt'])
+            if is_full_text_search_supported():
+                Content.objects.filter(pk__in=content_ids).update(search_vector=get_search_vector())
+            bump_card_versions(*content_ids)
+            updated += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Updated {updated} articles')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. {updated} articles updated.'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Content, Comment
+
+
+class Command(BaseCommand):
+    """
+    Management command that repairs the drift of the denormalized comment counters of articles.
+
+    The counters are compared with the actual number of comments, and all drifted counters are fixed
+    with a single bulk UPDATE.
+
+    Usage:
+        python manage.py reconcile_comment_counts [--dry-run]
+    """
+
+    help = 'Repairs the comment counters of articles that differ from the actual number of comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the number of drifted counters without fixing them.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Finds the drifted comment counters and fixes them.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+        """
+
+        comments = (
+            Comment.objects
+            .filter(content=OuterRef('pk'))
+            .order_by()
+            .values('content')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        actual_count = Coalesce(Subquery(comments), 0)
+        drifted = Content.objects.alias(actual_count=actual_count).exclude(comment_count=actual_count)
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted.count()} comment counters have drifted.')
+            return
+
+        updated = drifted.update(comment_count=actual_count)
+        self.stdout.write(self.style.SUCCESS(f'Done. {updated} comment counters repaired.'))
@@ -0,0 +1,136 @@
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from blog.models import Task
+from blog.tasks import run_task, get_retry_time, get_stats
+
+
+class Command(BaseCommand):
+    """
+    Management command that runs the background tasks stored in the database (TASKS_MODE = 'db').
+
+    The due tasks are claimed one at a time with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run
+    side by side without running a task twice. Every task runs and commits in its own transaction: a successful
+    task is deleted, a failed one is rolled back to a savepoint and retried later with a backoff.
+
+    Usage:
+        python manage.py run_worker [--batch-size N] [--interval SECONDS] [--once] [--stats]
+    """
+
+    help = 'Runs the background tasks stored in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='The number of tasks claimed at once.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when there are no due tasks.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the due tasks and exit.'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print the queue depth, the lag and the number of failed tasks and exit.'
+        )
+
+    def run_next(self):
+        """
+        Claims and runs the next due task in its own transaction.
+
+        The task is committed (and its cache side effects run) before the next one is claimed, and its row
+        is locked only while it runs.
+
+        Returns:
+            bool: False if there are no due tasks.
+        """
+
+        with transaction.atomic():
+            task = (
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(run_after__lte=timezone.now(), attempts__lt=settings.TASKS_MAX_ATTEMPTS)
+                .order_by('run_after', 'id')
+                .first()
+            )
+            if task is None:
+                return False
+            try:
+                with transaction.atomic():
+                    run_task(task.name, task.args, task.kwargs)
+            except Exception:
+                task.attempts += 1
+                task.last_error = traceback.format_exc()
+                task.run_after = get_retry_time(task.attempts)
+                task.save(update_fields=['attempts', 'last_error', 'run_after'])
+                self.stderr.write(f'{task} failed (attempt {task.attempts}):\n{task.last_error}')
+            else:
+                task.delete()
+        return True
+
+    def run_batch(self, batch_size):
+        """
+        Runs up to `batch_size` due tasks, each in its own transaction.
+
+        Args:
+            batch_size (int): The maximum number of tasks to run.
+
+        Returns:
+            int: The number of claimed tasks.
+        """
+
+        claimed = 0
+        while claimed < batch_size and self.run_next():
+            claimed += 1
+        return claimed
+
+    def handle(self, *args, **options):
+        """
+        Runs the stored tasks until interrupted, or once with the --once option.
+
+        Args:
+            *args: Variable length argument list.
+            **options: Command options.
+
+        Returns:
+            None
+
+        Raises:
+            CommandError: If the tasks are not stored in the database.
+        """
+
+        if settings.TASKS_MODE != 'db':
+            raise CommandError(f"TASKS_MODE is '{settings.TASKS_MODE}', the tasks are not stored in the database.")
+
+        if options['stats']:
+            stats = get_stats()
+            self.stdout.write(
+                f"depth={stats['depth']} lag={stats['oldest_age']:.1f}s failed={stats['failed']}"
+            )
+            return
+
+        try:
+            while True:
+                close_old_connections()
+                claimed = self.run_batch(options['batch_size'])
+                if claimed:
+                    self.stdout.write(f'Ran {claimed} tasks.')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
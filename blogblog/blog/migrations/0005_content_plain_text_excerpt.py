@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_author_date_time_last_post_alter_content_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=253),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='plain_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
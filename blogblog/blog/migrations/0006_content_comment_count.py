@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-17 00:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_count(apps, schema_editor):
+    Content = apps.get_model('blog', 'Content')
+    Comment = apps.get_model('blog', 'Comment')
+    comments = (
+        Comment.objects
+        .filter(content=OuterRef('pk'))
+        .order_by()
+        .values('content')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Content.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_content_plain_text_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+    ]
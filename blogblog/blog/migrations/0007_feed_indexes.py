@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_content_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content', 'date_time_create'], name='comment_content_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-date_time_create', '-id'], name='content_published_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['author', '-date_time_create', '-id'], name='content_author_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_email_duplicates(apps, schema_editor):
+    """
+    Stops the migration if some email is used by more than one user, in any case,
+    since the unique index could not be created then.
+    """
+
+    User = apps.get_model('auth', 'User')
+    duplicates = (
+        User.objects.using(schema_editor.connection.alias).exclude(email='')
+        .annotate(email_lower=Lower('email')).values('email_lower')
+        .annotate(count=Count('id')).filter(count__gt=1)
+    )
+    emails = [duplicate['email_lower'] for duplicate in duplicates[:10]]
+    if emails:
+        raise RuntimeError(
+            f'Some emails are used by more than one user (case-insensitively): {", ".join(emails)}. '
+            'Run "python manage.py check_email_duplicates" and resolve them before migrating.'
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Makes the emails of the users unique regardless of case, with a unique index on LOWER(email).
+
+    The users find each other and log in by their email (see UserEmailManager in blog/models.py), so the index
+    also serves those lookups. Users without an email (e.g. created with createsuperuser) are not indexed.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0008_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_email_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_lower_uniq ON auth_user (LOWER(email)) WHERE NOT (email = '')",
+            'DROP INDEX auth_user_email_lower_uniq',
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Max
+
+USERNAME_SEQUENCE = 'blog_username_seq'
+USERNAME_NUMBER_OFFSET = 100001
+
+
+def create_username_sequence(apps, schema_editor):
+    """
+    Creates the sequence of the username numbers on PostgreSQL. It starts after the numbers already given out,
+    which were the ID of the user plus USERNAME_NUMBER_OFFSET.
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('auth', 'User')
+    last_id = User.objects.using(schema_editor.connection.alias).aggregate(last_id=Max('id'))['last_id'] or 0
+    schema_editor.execute(
+        f'CREATE SEQUENCE IF NOT EXISTS {USERNAME_SEQUENCE} START WITH {last_id + 1 + USERNAME_NUMBER_OFFSET}'
+    )
+
+
+def drop_username_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {USERNAME_SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+    """
+    Adds the sequence that the numbers of the usernames of new users are taken from (see get_next_username_number()
+    in blog/models.py). Other databases do not need it.
+    """
+
+    dependencies = [
+        ('blog', '0009_user_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_sequence, drop_username_sequence),
+    ]
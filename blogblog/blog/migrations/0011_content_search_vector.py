@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 01:29
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+SEARCH_INDEX = 'content_search_vector_idx'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Fills in the search vectors of the existing contents and creates the GIN index of the published ones
+    on PostgreSQL. Other databases search without the vectors (see blog/search.py).
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Content = apps.get_model('blog', 'Content')
+    config = settings.SEARCH_CONFIG
+    Content.objects.using(schema_editor.connection.alias).update(
+        search_vector=SearchVector('title', weight='A', config=config)
+        + SearchVector('plain_text', weight='B', config=config)
+    )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON blog_content USING gin (search_vector) WHERE is_published'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_username_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TITLE_TRIGRAM_INDEX = 'content_title_trgm_idx'
+
+
+def create_title_trigram_index(apps, schema_editor):
+    """
+    Creates the trigram GIN index of the titles of the published contents on PostgreSQL.
+
+    The index is built on UPPER(title), the expression that Django compares in the `icontains` lookups,
+    so the title suggestions (see get_suggestions() in blog/search.py) can use it.
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TITLE_TRIGRAM_INDEX} ON blog_content '
+        f'USING gin (UPPER(title) gin_trgm_ops) WHERE is_published'
+    )
+
+
+def drop_title_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TITLE_TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+    """
+    Adds the pg_trgm extension and the trigram index of the titles for the search suggestions.
+    Both are created on PostgreSQL only; other databases match the titles without an index.
+    """
+
+    dependencies = [
+        ('blog', '0011_content_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_title_trigram_index, drop_title_trigram_index),
+    ]
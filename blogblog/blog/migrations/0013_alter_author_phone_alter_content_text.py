@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 01:40
+
+import django.core.validators
+from django.db import migrations, models
+import tinymce.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_content_title_trgm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='phone',
+            field=models.CharField(blank=True, max_length=25, null=True, validators=[django.core.validators.RegexValidator(message='Enter a valid phone number.', regex='^\\+?1?\\d{9,15}$')]),
+        ),
+        migrations.AlterField(
+            model_name='content',
+            name='text',
+            field=tinymce.models.HTMLField(verbose_name='Text (maximum 2500 characters)'),
+        ),
+    ]
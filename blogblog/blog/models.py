@@ -1,16 +1,110 @@
-from bs4 import BeautifulSoup
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, connection
+from django.db.models import Max
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.text import slugify
 from tinymce.models import HTMLField
 
-from .helpers import to_latin
+from .helpers import to_latin, html_to_text, truncate_text
+from .tasks import record_author_activity, rebuild_excerpt, update_search_vector
 from .validators import phone_validator
 
 User._meta.get_field('email')._unique = True
 
 
+class UserEmailManager(models.Manager):
+    """
+    Manager for finding users by their email.
+
+    Emails are compared case-insensitively, by `LOWER(email)`, which is what the unique index
+    `auth_user_email_lower_uniq` (migration 0009) is built on. Empty emails are not indexed and never match.
+    Available as `User.accounts`; `User.objects` is left intact for the auth app and its migrations.
+
+    Methods:
+        filter_by_email(email): Returns the queryset of the users with the email.
+        get_by_email(email): Returns the user with the email or None.
+        get_email_duplicates(): Returns the emails that are used by more than one user.
+    """
+
+    use_in_migrations = False
+
+    def filter_by_email(self, email):
+        """
+        Returns the queryset of the users with the given email, in any case.
+
+        Args:
+            email (str): The email.
+
+        Returns:
+            QuerySet: The users with the email (at most one once the unique index exists).
+        """
+
+        queryset = self.exclude(email='').alias(email_lower=Lower('email'))
+        return queryset.filter(email_lower=email.lower())
+
+    def get_by_email(self, email):
+        """
+        Returns the user with the given email, in any case.
+
+        Args:
+            email (str): The email.
+
+        Returns:
+            User: The user, or None if there is no user with the email.
+        """
+
+        return self.filter_by_email(email).order_by('pk').first()
+
+    def get_email_duplicates(self):
+        """
+        Returns the emails (lowercased) that are used by more than one user, with the number of the users.
+
+        Returns:
+            QuerySet: Dicts with the 'email_lower' and 'count' keys.
+        """
+
+        queryset = self.exclude(email='').annotate(email_lower=Lower('email')).values('email_lower')
+        return queryset.annotate(count=models.Count('id')).filter(count__gt=1).order_by('email_lower')
+
+
+# Usernames of the users who sign up end with a unique number. On PostgreSQL it is taken from a sequence
+# (migration 0010), so a signup needs no extra query and no second write to find it out
+USERNAME_SEQUENCE = 'blog_username_seq'
+USERNAME_NUMBER_OFFSET = 100001
+
+
+def get_next_username_number():
+    """
+    Returns a new unique number for the username of a new user.
+
+    On PostgreSQL the number comes from the sequence, which does not lock anything, so concurrent signups
+    do not wait for each other. On other databases (SQLite in development) the number follows the largest
+    user ID, as the ID of the new user plus USERNAME_NUMBER_OFFSET used to. Two concurrent signups may read
+    the same largest ID, so that fallback is unique only for a single writer; UserSignUpForm.save_user()
+    retries the insert with a new number.
+
+    Returns:
+        int: The number.
+    """
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [USERNAME_SEQUENCE])
+            return cursor.fetchone()[0]
+    last_id = User.objects.aggregate(last_id=models.Max('id'))['last_id'] or 0
+    return last_id + 1 + USERNAME_NUMBER_OFFSET
+
+
+# A manager declared on User itself would take precedence over the inherited UserManager as the default one
+User._meta.default_manager_name = 'objects'
+User.add_to_class('accounts', UserEmailManager())
+
+
 class ShortTextMixin:
     """
     Mixin for shortening the text of an article for convenient display in previews.
@@ -20,6 +114,7 @@ class ShortTextMixin:
         - title (str): The title of the article.
 
     Methods:
+        - get_plain_text(): Returns the text without HTML tags.
         - short_text(length=None): Returns a shortened version of the text.
         - short_title(): Returns a shortened version of the title.
     """
@@ -28,13 +123,25 @@ class ShortTextMixin:
     title: str
     short_length = 60
 
+    def get_plain_text(self):
+        """
+        Returns the text without HTML tags.
+
+        The BeautifulSoup parser is used to remove unnecessary characters and tags from the HTML.
+        Models that store the plain text override this method to avoid parsing.
+
+        Returns:
+            str: Plain text.
+        """
+
+        return html_to_text(self.text)
+
     def short_text(self, length=None):
         """
         Returns a shortened version of the text.
 
         The text is reduced to the specified length (default is 60 characters),
         or it is not reduced if it contains fewer characters.
-        The BeautifulSoup parser is used to remove unnecessary characters and tags from the HTML.
 
         Args:
             length (int): The desired length of the shortened text.
@@ -45,13 +152,7 @@ class ShortTextMixin:
 
         if length is None:
             length = self.short_length
-        soup = BeautifulSoup(self.text, 'html.parser')
-        text = soup.get_text(separator=' ')
-
-        if len(text) > length:
-            return f'{text[:length]}...'
-        else:
-            return text
+        return truncate_text(self.get_plain_text(), length)
 
     def short_title(self):
         """
@@ -63,10 +164,79 @@ class ShortTextMixin:
         Returns:
             str: Shortened title.
         """
-        if len(self.title) > self.short_length:
-            return f'{self.title[:self.short_length]}...'
-        else:
-            return self.title
+        return truncate_text(self.title, self.short_length)
+
+
+class DirtyFieldsMixin:
+    """
+    Mixin for tracking the fields changed since the instance was loaded from the database.
+
+    The values of the loaded fields are remembered in `from_db()` and after every save,
+    so the changes are found without querying the database. Must precede models.Model in the bases.
+
+    Methods:
+        - from_db(db, field_names, values): Creates the instance and remembers the loaded values.
+        - get_dirty_fields(): Returns the names of the changed fields.
+        - get_loaded_value(name): Returns the value of the field when the instance was loaded or saved.
+    """
+
+    _loaded_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Creates the instance from the database row and remembers the loaded values.
+
+        Deferred fields are not remembered, they are never reported as changed.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+
+    def _remember_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def get_dirty_fields(self):
+        """
+        Returns the names of the fields changed since the instance was loaded or saved.
+
+        Returns:
+            list: The attribute names of the changed fields, or None if the loaded values are unknown
+            (the instance has not been loaded from the database).
+        """
+
+        if self._loaded_values is None:
+            return None
+        return [
+            name for name, value in self._loaded_values.items()
+            if getattr(self, name) != value
+        ]
+
+    def get_loaded_value(self, name):
+        """
+        Returns the value of the field when the instance was loaded or saved. The post_save signal handlers
+        see the previous values, which are remembered after the signal.
+
+        Args:
+            name (str): The attribute name of the field, e.g. 'content_id'.
+
+        Returns:
+            The loaded value, or the current one if the loaded values are unknown or the field was deferred.
+        """
+
+        if self._loaded_values is None:
+            return getattr(self, name)
+        return self._loaded_values.get(name, getattr(self, name))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_values()
 
 
 class Author(models.Model):
@@ -84,6 +254,8 @@ class Author(models.Model):
 
     Methods:
         - __str__(): Returns a string representation of the author.
+        - mark_active(posted): Records the activity of the author with a single background UPDATE.
+        - get_last_post_time(): Returns the time of the last post of the author from the database.
     """
 
     user: User
@@ -119,12 +291,64 @@ class Author(models.Model):
         else:
             return f'{self.user.username}'
 
+    def mark_active(self, posted=False):
+        """
+        Records the activity of the author.
+
+        The changed columns are written with a single UPDATE instead of saving the whole row,
+        by a task that runs after the request's transaction commits.
+        The last activity is written at most once per AUTHOR_ACTIVITY_THROTTLE minutes,
+        so busy authors do not rewrite their row on every action. Posting content is always written.
+
+        Args:
+            posted (bool): A flag indicating whether the author has posted new content.
+
+        Returns:
+            bool: True if the update was enqueued, False if it was throttled.
+        """
+
+        now = timezone.now()
+        throttle = timedelta(minutes=settings.AUTHOR_ACTIVITY_THROTTLE)
+        fields = {}
+        if posted:
+            fields['date_time_last_post'] = now
+        if posted or not self.date_last_active or now - self.date_last_active >= throttle:
+            fields['date_last_active'] = now
+        if not fields:
+            return False
+
+        for name, value in fields.items():
+            setattr(self, name, value)
+        record_author_activity.delay(self.pk, self.user_id, {name: value.isoformat() for name, value in fields.items()})
+        return True
+
+    def get_last_post_time(self):
+        """
+        Returns the time of the last post of the author, read from the database.
+
+        The author of the request may come from the cache, and `date_time_last_post` is written by a background task
+        after the post, so both the stored time and the creation time of the newest content are read, in one query.
 
-class Content(models.Model, ShortTextMixin):
+        Returns:
+            datetime: The time of the last post, or None if the author has not posted.
+        """
+
+        times = (
+            Author.objects
+            .filter(pk=self.pk)
+            .annotate(last_content=Max('content__date_time_create'))
+            .values_list('date_time_last_post', 'last_content')
+            .first()
+        )
+        return max(filter(None, times or ()), default=None)
+
+
+class Content(DirtyFieldsMixin, models.Model, ShortTextMixin):
     """
     Model representing a content.
 
     Inherits from:
+        - DirtyFieldsMixin
         - models.Model
         - ShortTextMixin
 
@@ -137,12 +361,23 @@ class Content(models.Model, ShortTextMixin):
         - date_time_edit (DateTimeField): The date and time of content last edit.
         - author (ForeignKey): The author of the content.
         - is_published (BooleanField): The publication status of the content.
+        - plain_text (TextField): The text of the content without HTML tags. Filled in automatically.
+        - excerpt (CharField): The shortened plain text shown in the feed. Filled in automatically.
+        - comment_count (PositiveIntegerField): The number of comments on the content.
+          Maintained by the comment signal handlers in "blog/signals.py".
+        - search_vector (SearchVectorField): The full-text search vector of the title and the plain text.
+          Filled in automatically on PostgreSQL, see "blog/search.py".
 
     Methods:
         - save(*args, **kwargs): Overrides the default save method to set the creation date, generate a slug,
-          and save the instance.
-        - unpublish(): Sets the is_published field of the content to False and saves the instance.
-        - publish(): Sets the is_published field of the content to True and saves the instance.
+          save the changed fields of the instance and enqueue the rebuilding of the excerpt and the search vector.
+        - build_excerpt(): Fills in the plain text and the excerpt from the HTML text.
+        - get_plain_text(): Returns the stored plain text of the content.
+        - unpublish(): Sets the is_published field of the content to False and saves the field.
+        - publish(): Sets the is_published field of the content to True and saves the field.
+        - get_neighbour_querysets(): Returns the querysets of the previous and the next published contents.
+        - get_neighbours(): Returns the previous and the next published contents in one query.
+        - aget_neighbours(): Asynchronous version of get_neighbours().
         - __str__(): Returns a string representation of the content.
 
     Returns:
@@ -156,6 +391,7 @@ class Content(models.Model, ShortTextMixin):
 
     id: int
     text: str
+    excerpt_length = 250
 
     title = models.CharField(
         max_length=120,
@@ -186,6 +422,40 @@ class Content(models.Model, ShortTextMixin):
         default=True,
         null=False
     )
+    plain_text = models.TextField(
+        blank=True,
+        default='',
+        editable=False
+    )
+    excerpt = models.CharField(
+        max_length=excerpt_length + 3,
+        blank=True,
+        default='',
+        editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [
+            # The published feed and the previous/next article lookups
+            models.Index(
+                fields=['-date_time_create', '-id'],
+                condition=models.Q(is_published=True),
+                name='content_published_feed_idx'
+            ),
+            # The feed of the author's own articles
+            models.Index(
+                fields=['author', '-date_time_create', '-id'],
+                name='content_author_feed_idx'
+            ),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -193,7 +463,14 @@ class Content(models.Model, ShortTextMixin):
 
     def save(self, *args, **kwargs):
         """
-        Overrides the default save method to set the creation date, generate a slug, and save the instance.
+        Overrides the default save method to set the creation date, generate a slug, save the instance
+        and enqueue the rebuilding of the excerpt and the search vector.
+
+        The HTML text is parsed once per change by a background task, so that neither the request
+        nor the feed and the admin panel parse the HTML of every article. The task also rebuilds the search vector;
+        if only the title has changed, just the search vector is rebuilt.
+        An instance loaded from the database writes only its changed fields (and the edit date),
+        so a save does not overwrite the comment counter maintained with F() updates.
 
         Args:
             *args: Additional positional arguments.
@@ -208,27 +485,121 @@ class Content(models.Model, ShortTextMixin):
             date_time = self.date_time_create.strftime("%Y-%m-%d-%H-%M-%S")
             slug = slugify(f'{self.title}-{date_time}', allow_unicode=True)
             self.slug = to_latin(slug)
+
+        dirty_fields = self.get_dirty_fields()
+        if dirty_fields is not None and not self._state.adding \
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = set(dirty_fields)
+            if kwargs['update_fields']:
+                kwargs['update_fields'].add('date_time_edit')
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        if (dirty_fields is None or 'text' in dirty_fields) and (update_fields is None or 'text' in update_fields):
+            rebuild_excerpt.delay(self.pk)
+        elif 'title' in (dirty_fields or ()) and (update_fields is None or 'title' in update_fields):
+            update_search_vector.delay(self.pk)
+
+    def build_excerpt(self):
+        """
+        Fills in the `plain_text` and `excerpt` fields from the HTML text of the content.
+
+        Returns:
+            None
+        """
+        self.plain_text = html_to_text(self.text)
+        self.excerpt = truncate_text(self.plain_text, self.excerpt_length)
+
+    def get_plain_text(self):
+        """
+        Returns the stored plain text of the content.
+
+        Falls back to parsing the HTML if the plain text has not been built yet.
+
+        Returns:
+            str: Plain text.
+        """
+        if not self.plain_text and self.text:
+            return super().get_plain_text()
+        return self.plain_text
+
     def unpublish(self):
         """
-        Sets the `is_published` field of the content to False and saves the instance.
+        Sets the `is_published` field of the content to False and saves the field with a single UPDATE.
 
         Returns:
             None
         """
         self.is_published = False
-        self.save()
+        self.save(update_fields=['is_published'])
 
     def publish(self):
         """
-        Sets the `is_published` field of the content to True and saves the instance.
+        Sets the `is_published` field of the content to True and saves the field with a single UPDATE.
 
         Returns:
             None
         """
         self.is_published = True
-        self.save()
+        self.save(update_fields=['is_published'])
+
+    def get_neighbour_querysets(self):
+        """
+        Returns the querysets of the previous (older) and the next (newer) published contents.
+
+        Each queryset is a LIMIT 1 scan of the published feed index and loads only the fields needed for navigation.
+
+        Returns:
+            tuple: The querysets of the previous and the next contents.
+        """
+        published = Content.objects.filter(is_published=True).only('id', 'slug', 'title', 'date_time_create')
+        prev_queryset = (
+            published
+            .filter(date_time_create__lt=self.date_time_create)
+            .order_by('-date_time_create', '-id')[:1]
+        )
+        next_queryset = (
+            published
+            .filter(date_time_create__gt=self.date_time_create)
+            .order_by('date_time_create', 'id')[:1]
+        )
+        return prev_queryset, next_queryset
+
+    def get_neighbours(self):
+        """
+        Returns the previous (older) and the next (newer) published contents.
+
+        Both contents are fetched in one query with a UNION of two LIMIT 1 scans.
+        Databases that do not support ordered and sliced subqueries in a UNION (SQLite) get two queries instead.
+
+        Returns:
+            tuple: The previous and the next contents, None if there is no such content.
+        """
+        prev_queryset, next_queryset = self.get_neighbour_querysets()
+        if not connection.features.supports_slicing_ordering_in_compound:
+            return prev_queryset.first(), next_queryset.first()
+        return self._split_neighbours(prev_queryset.union(next_queryset, all=True))
+
+    async def aget_neighbours(self):
+        """
+        Asynchronous version of `get_neighbours()`.
+        """
+        prev_queryset, next_queryset = self.get_neighbour_querysets()
+        if not connection.features.supports_slicing_ordering_in_compound:
+            return await prev_queryset.afirst(), await next_queryset.afirst()
+        return self._split_neighbours([content async for content in prev_queryset.union(next_queryset, all=True)])
+
+    def _split_neighbours(self, contents):
+        """
+        Tells the previous content from the next one among the results of the combined query.
+        """
+        prev_content = next_content = None
+        for content in contents:
+            if content.date_time_create < self.date_time_create:
+                prev_content = content
+            else:
+                next_content = content
+        return prev_content, next_content
 
     def __str__(self):
         """
@@ -243,11 +614,12 @@ class Content(models.Model, ShortTextMixin):
         return f'Post {self.id} (author: {self.author.user.username})'
 
 
-class Comment(models.Model, ShortTextMixin):
+class Comment(DirtyFieldsMixin, models.Model, ShortTextMixin):
     """
     Model representing a comment.
 
     Inherits from:
+        - DirtyFieldsMixin
         - models.Model
         - ShortTextMixin
 
@@ -280,3 +652,74 @@ class Comment(models.Model, ShortTextMixin):
         on_delete=models.SET_NULL,
         null=True
     )
+
+    class Meta:
+        indexes = [
+            # The comments of an article in the order of creation
+            models.Index(
+                fields=['content', 'date_time_create'],
+                name='comment_content_created_idx'
+            ),
+        ]
+
+
+class Task(models.Model):
+    """
+    Model representing a background task stored in the database.
+
+    Used when the TASKS_MODE setting is 'db': the task is written within the transaction that caused it
+    and is run by the "run_worker" management command. A failed task is retried with a backoff
+    until it runs out of attempts; then it stays in the table with its last error.
+
+    Inherits from:
+        - models.Model
+
+    Attributes:
+        - name (CharField): The dotted path of the task function.
+        - args (JSONField): Positional arguments of the task.
+        - kwargs (JSONField): Keyword arguments of the task.
+        - date_time_create (DateTimeField): The date and time the task was enqueued.
+        - run_after (DateTimeField): The task is not run before this date and time.
+        - attempts (PositiveSmallIntegerField): The number of failed attempts.
+        - last_error (TextField): The error of the last failed attempt.
+    """
+
+    name = models.CharField(
+        max_length=200
+    )
+    args = models.JSONField(
+        default=list
+    )
+    kwargs = models.JSONField(
+        default=dict
+    )
+    date_time_create = models.DateTimeField(
+        auto_now_add=True
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0
+    )
+    last_error = models.TextField(
+        blank=True,
+        default=''
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_after', 'id'],
+                name='task_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the task.
+
+        Returns:
+            str: String representation of the task.
+        """
+        return f'Task {self.id} ({self.name})'
@@ -0,0 +1,232 @@
+import datetime
+import json
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    A page of objects produced by the CursorPaginator.
+
+    Provides the part of the Django Page interface that the feed templates and views rely on.
+
+    Attributes:
+        - object_list (list): The objects of the page.
+        - number (str): The cursor the page was requested with, or None for the first page.
+        - next_cursor (str): The cursor of the next page, or None if this is the last page.
+
+    Methods:
+        - has_next(): Returns True if there is a next page.
+        - has_previous(): Returns True if the page is not the first one.
+        - has_other_pages(): Returns True if there is a next or a previous page.
+        - next_page_number(): Returns the cursor of the next page.
+    """
+
+    def __init__(self, object_list, number, next_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.number is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.next_cursor
+
+
+class CursorPaginator:
+    """
+    Keyset (cursor) paginator.
+
+    Instead of counting the rows and skipping them with OFFSET, the paginator remembers the ordering values
+    of the last object of a page in an opaque signed cursor and starts the next page right after it.
+    The page size is fetched with one extra row to find out whether there is a next page.
+    The last ordering field must be unique (usually the primary key), so that the ordering is total.
+
+    Attributes:
+        - queryset (QuerySet): The queryset to paginate.
+        - per_page (int): The number of objects per page.
+        - ordering (tuple): The ordering fields, descending fields are prefixed with '-'.
+
+    Methods:
+        - page(cursor): Returns the page that starts after the given cursor.
+        - apage(cursor): Asynchronous version of page().
+        - get_page_queryset(cursor): Returns the unevaluated queryset of the page that starts after the given cursor.
+        - encode_cursor(obj): Returns the cursor pointing right after the given object.
+        - decode_cursor(cursor): Returns the ordering values stored in the cursor.
+    """
+
+    salt = 'blog.pagination.cursor'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def _fields(self):
+        """
+        Returns pairs of the ordering field names and the flag of descending order.
+        """
+
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _to_python(self, name, value):
+        """
+        Converts the value stored in the cursor back to the Python type of the ordering field.
+        """
+
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            field = annotation.output_field
+        else:
+            field = self.queryset.model._meta.get_field(name)
+        return field.to_python(value)
+
+    def encode_cursor(self, obj):
+        """
+        Returns the cursor pointing right after the given object.
+
+        Args:
+            obj (Model): The last object of a page.
+
+        Returns:
+            str: The signed cursor.
+        """
+
+        values = [getattr(obj, name) for name, _ in self._fields()]
+        return signing.dumps(values, salt=self.salt, serializer=CursorSerializer)
+
+    def decode_cursor(self, cursor):
+        """
+        Returns the ordering values stored in the cursor.
+
+        Args:
+            cursor (str): The signed cursor.
+
+        Returns:
+            list: The ordering values.
+
+        Raises:
+            InvalidPage: If the cursor is malformed or was not issued by this paginator.
+        """
+
+        try:
+            values = signing.loads(cursor, salt=self.salt, serializer=CursorSerializer)
+            fields = self._fields()
+            if len(values) != len(fields):
+                raise ValueError
+            return [self._to_python(name, value) for (name, _), value in zip(fields, values)]
+        except (signing.BadSignature, ValueError, TypeError, ValidationError) as error:
+            raise InvalidPage('Invalid cursor') from error
+
+    def _after(self, values):
+        """
+        Builds the filter that selects the rows located after the given ordering values.
+
+        For the ordering (a, b) it is a >= x AND ((a > x) OR (a = x AND b > y)), with the comparisons reversed
+        for descending fields. The OR alone cannot be used as an index condition, so the redundant bound
+        on the first field lets the database seek to the cursor in the index instead of filtering all the rows
+        before it, and the cost of a page does not grow with its depth.
+        """
+
+        fields = self._fields()
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(fields, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        (first_name, first_descending), first_value = fields[0], values[0]
+        bound = Q(**{f'{first_name}__{"lte" if first_descending else "gte"}': first_value})
+        return bound & condition
+
+    def get_page_queryset(self, cursor=None):
+        """
+        Returns the unevaluated queryset of the page that starts after the given cursor.
+
+        The queryset is limited to the page size plus one extra row that shows whether there is a next page.
+
+        Args:
+            cursor (str, optional): The cursor returned with the previous page. None for the first page.
+
+        Returns:
+            QuerySet: The queryset of the page.
+
+        Raises:
+            InvalidPage: If the cursor is invalid.
+        """
+
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        """
+        Returns the page that starts after the given cursor.
+
+        Args:
+            cursor (str, optional): The cursor returned with the previous page. None for the first page.
+
+        Returns:
+            CursorPage: The requested page.
+
+        Raises:
+            InvalidPage: If the cursor is invalid.
+        """
+
+        return self._build_page(list(self.get_page_queryset(cursor)), cursor)
+
+    async def apage(self, cursor=None):
+        """
+        Asynchronous version of `page()`.
+        """
+
+        return self._build_page([obj async for obj in self.get_page_queryset(cursor)], cursor)
+
+    def _build_page(self, object_list, cursor):
+        """
+        Builds the page from the fetched objects, dropping the extra row.
+        """
+
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return CursorPage(object_list, cursor or None, next_cursor)
+
+
+class CursorSerializer:
+    """
+    Compact JSON serializer for the cursor values, which are usually dates and numbers.
+
+    Dates are stored with full microsecond precision, otherwise rows created within
+    the same millisecond would be skipped.
+    """
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), default=self.default).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Content
+
+# Full-text search of the published contents. On PostgreSQL every content stores its `search_vector`
+# (the title weighted over the plain text), which is matched through the GIN index "content_search_vector_idx"
+# (see migration 0011) and ranked with ts_rank. Other databases (SQLite in local setups and tests) fall back to
+# a case-insensitive substring match, with the title matches ranked first.
+
+# Longer queries are cut, so that a request cannot make the database parse an arbitrarily long query
+SEARCH_QUERY_MAX_LENGTH = 100
+# The number of titles suggested while the query is typed
+SUGGESTIONS_LIMIT = 8
+
+
+def is_full_text_search_supported():
+    """
+    Returns True if the database supports the full-text search (PostgreSQL).
+    """
+
+    return connection.vendor == 'postgresql'
+
+
+def get_search_vector(plain_text='plain_text'):
+    """
+    Returns the expression of the search vector of a content: the title with the weight A and the plain text
+    with the weight B, in the SEARCH_CONFIG text search configuration.
+
+    Args:
+        plain_text (str or Expression): The plain text: the name of the field or an expression,
+            e.g. Value() with the text that is being written in the same UPDATE.
+
+    Returns:
+        CombinedExpression: The search vector.
+    """
+
+    config = settings.SEARCH_CONFIG
+    return (SearchVector('title', weight='A', config=config)
+            + SearchVector(plain_text, weight='B', config=config))
+
+
+def search_contents(queryset, query):
+    """
+    Filters the contents that match the query and annotates them with the `rank` of the match.
+
+    The query is written as in a web search engine: words, "quoted phrases", OR and -excluded words.
+    The rank is a double precision number, so that it goes through the pagination cursor without losing precision
+    and is compared with the same value in the keyset condition.
+
+    Args:
+        queryset (QuerySet): The contents to search in.
+        query (str): The search query.
+
+    Returns:
+        QuerySet: The matching contents with the `rank` annotation, or an empty queryset for an empty query.
+    """
+
+    query = query.strip()[:SEARCH_QUERY_MAX_LENGTH]
+    if not query:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+    if is_full_text_search_supported():
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        )
+
+    return queryset.filter(Q(title__icontains=query) | Q(plain_text__icontains=query)).annotate(
+        rank=Case(When(title__icontains=query, then=Value(1.0)), default=Value(0.5), output_field=FloatField())
+    )
+
+
+def get_suggestions_queryset(query, limit=SUGGESTIONS_LIMIT):
+    """
+    Returns the queryset of the titles and the slugs of the newest published contents whose titles contain the query.
+
+    Called on every keystroke, so the query is a plain case-insensitive substring match: on PostgreSQL
+    it is answered by the trigram GIN index "content_title_trgm_idx" on UPPER(title) (see migration 0012),
+    which serves the UPPER(title) LIKE UPPER('%query%') condition of `icontains` for queries of three characters
+    and more. Shorter queries match too many titles for the index; their suggestions are cached
+    (see get_search_suggestions() in "blog/caching.py"). The plan is checked by "python manage.py check_query_plans".
+
+    Args:
+        query (str): The typed query, stripped and not empty.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        QuerySet: The (title, slug) tuples.
+    """
+
+    return (
+        Content.objects
+        .filter(is_published=True, title__icontains=query)
+        .order_by('-date_time_create', '-id')
+        .values_list('title', 'slug')[:limit]
+    )
+
+
+def get_suggestions(query, limit=SUGGESTIONS_LIMIT):
+    """
+    Returns the titles and the slugs of the newest published contents whose titles contain the query.
+
+    Args:
+        query (str): The typed query.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        list: Dicts with the 'title' and the 'slug' of the contents.
+    """
+
+    query = query.strip()[:SEARCH_QUERY_MAX_LENGTH]
+    if not query:
+        return []
+    return [{'title': title, 'slug': slug} for title, slug in get_suggestions_queryset(query, limit)]
@@ -1,10 +1,17 @@
+from functools import partial
+
 from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
+from .caching import bump_feed_version, bump_card_versions, invalidate_content_state, invalidate_user
 from .models import Author, Content, Comment
+from .tasks import invalidate_user_contents
 
 
 @receiver(post_save, sender=User)
@@ -44,9 +51,7 @@ def update_author_last_active_login(sender, user, **kwargs):
     Returns:
         None
     """
-    author = Author.objects.get(user=user)
-    author.date_last_active = timezone.now()
-    author.save()
+    user.author.mark_active()
 
 
 @receiver(user_logged_out)
@@ -64,16 +69,14 @@ def update_author_last_active_logout(sender, user, **kwargs):
     Returns:
         None
     """
-    author = Author.objects.get(user=user)
-    author.date_last_active = timezone.now()
-    author.save()
+    user.author.mark_active()
 
 
 @receiver(post_save, sender=Content)
 def update_author_last_active_content(sender, instance, created, **kwargs):
     """
-    Signal handler function that updates the 'date_last_active' field of the related 'Author' record
-    when a new Content object is created.
+    Signal handler function that updates the 'date_last_active' and 'date_time_last_post' fields
+    of the related 'Author' record when a new Content object is created.
 
     Args:
         sender (Model): The model class that sent the signal.
@@ -84,9 +87,7 @@ def update_author_last_active_content(sender, instance, created, **kwargs):
         None
     """
     if created:
-        author = instance.author
-        author.date_last_active = timezone.now()
-        author.save()
+        instance.author.mark_active(posted=True)
 
 
 @receiver(post_save, sender=Comment)
@@ -104,9 +105,7 @@ def update_author_last_active_comment(sender, instance, created, **kwargs):
         None
     """
     if created:
-        author = instance.author
-        author.date_last_active = timezone.now()
-        author.save()
+        instance.author.mark_active()
 
 
 @receiver(pre_save, sender=Content)
@@ -122,11 +121,184 @@ def update_author_last_active_edit_content(sender, instance, **kwargs):
     Returns:
         None
     """
-    try:
-        original_instance = Content.objects.get(pk=instance.pk)
-    except Content.DoesNotExist:
+    if instance._state.adding:
+        return
+
+    instance.author.mark_active()
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_count(sender, instance, created, **kwargs):
+    """
+    Signal handler function that increases the 'comment_count' field of the related 'Content' record
+    when a new Comment object is created, and moves the count when a comment is moved to another content
+    (e.g. in the admin panel).
+
+    The counters are changed with atomic F-expression UPDATEs, so concurrent comments do not overwrite each other.
+    The previous content is known for a comment loaded from the database (see DirtyFieldsMixin).
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Comment): The Comment object that was saved.
+        created (bool): A boolean value indicating if the Comment object was created or updated.
+
+    Returns:
+        None
+    """
+    previous_content_id = None if created else instance.get_loaded_value('content_id')
+    if previous_content_id == instance.content_id:
         return
+    if previous_content_id:
+        Content.objects.filter(pk=previous_content_id).update(comment_count=Greatest(F('comment_count') - 1, 0))
+    if instance.content_id:
+        Content.objects.filter(pk=instance.content_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comment_count(sender, instance, **kwargs):
+    """
+    Signal handler function that decreases the 'comment_count' field of the related 'Content' record
+    when a Comment object is deleted.
 
-    author = instance.author
-    author.date_last_active = timezone.now()
-    author.save()
+    The counter is changed with an atomic F-expression UPDATE and never goes below zero.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Comment): The Comment object that was deleted.
+
+    Returns:
+        None
+    """
+    if instance.content_id:
+        Content.objects.filter(pk=instance.content_id).update(comment_count=Greatest(F('comment_count') - 1, 0))
+
+
+# The caches are invalidated after the transaction commits, otherwise a concurrent request could cache the old data
+# again before the new data becomes visible. Invalidation is cheap and runs in the request, so the author
+# sees their own change on the next page; slower bookkeeping is enqueued as tasks (see "blog/tasks.py").
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_feed_cache(sender, instance, **kwargs):
+    """
+    Signal handler function that invalidates the cached data depending on the whole feed,
+    such as the previous and the next articles, when a Content object is created, edited,
+    published, unpublished or deleted.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Content): The Content object that was saved or deleted.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(bump_feed_version)
+
+
+@receiver(post_save, sender=Content)
+def invalidate_content_card(sender, instance, **kwargs):
+    """
+    Signal handler function that invalidates the cached feed card of a Content object when it is saved
+    (created, edited, published or unpublished).
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Content): The Content object that was saved.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(partial(bump_card_versions, instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_contents(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal handler function that invalidates the cached feed cards and pages that show the name of a user
+    (the contents of the user and the contents the user commented on) when the name may have changed.
+
+    Args:
+        sender (Type[User]): The sender of the signal (User model class).
+        instance (User): The User instance that was saved.
+        created (bool): A flag indicating whether the User instance was created or not.
+        update_fields (frozenset, optional): The fields that were updated, None if all the fields were saved.
+
+    Returns:
+        None
+    """
+    if created or (update_fields is not None and not {'first_name', 'last_name', 'username'} & update_fields):
+        return
+    invalidate_user_contents.delay(instance.pk)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content_page(sender, instance, **kwargs):
+    """
+    Signal handler function that invalidates the HTTP validators and the cached pages of a Content object
+    when it is saved or deleted.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Content): The Content object that was saved or deleted.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(partial(invalidate_content_state, instance.slug))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_content_page(sender, instance, **kwargs):
+    """
+    Signal handler function that invalidates the HTTP validators and the cached pages of the related 'Content'
+    record when a Comment object is saved or deleted, and of the previous one when the comment was moved.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Comment): The Comment object that was saved or deleted.
+
+    Returns:
+        None
+    """
+    if instance.content_id:
+        transaction.on_commit(partial(invalidate_content_state, instance.content.slug))
+    previous_content_id = instance.get_loaded_value('content_id')
+    if previous_content_id and previous_content_id != instance.content_id:
+        slug = Content.objects.filter(pk=previous_content_id).values_list('slug', flat=True).first()
+        if slug:
+            transaction.on_commit(partial(invalidate_content_state, slug))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Signal handler function that removes the user cached by the authentication backend
+    when the User record is saved or deleted.
+
+    Args:
+        sender (Type[User]): The sender of the signal (User model class).
+        instance (User): The User instance that was saved or deleted.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(partial(invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def invalidate_cached_author_user(sender, instance, **kwargs):
+    """
+    Signal handler function that removes the user cached by the authentication backend
+    when the related 'Author' record is saved, since the author is cached together with the user.
+
+    Args:
+        sender (Model): The model class that sent the signal.
+        instance (Author): The Author instance that was saved.
+
+    Returns:
+        None
+    """
+    transaction.on_commit(partial(invalidate_user, instance.user_id))
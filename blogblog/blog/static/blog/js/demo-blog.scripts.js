@@ -1,9 +1,44 @@
+var searchInput = document.querySelector("#search-input");
+if (searchInput) {
+    // The titles of the matching articles are suggested on every keystroke
+    searchInput.addEventListener("input", function() {
+        var query = searchInput.value.trim();
+        var suggestions = document.querySelector("#search-suggestions");
+        if (!query) {
+            suggestions.innerHTML = "";
+            return;
+        }
+        fetch(searchInput.dataset.suggestUrl + "?q=" + encodeURIComponent(query), {
+            headers: {
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            // A late response to an earlier keystroke is dropped
+            if (query !== searchInput.value.trim()) {
+                return;
+            }
+            suggestions.innerHTML = "";
+            data.results.forEach(function(result) {
+                var option = document.createElement("option");
+                option.value = result.title;
+                suggestions.appendChild(option);
+            });
+        });
+    });
+}
+
 document.querySelector("#load-more").addEventListener("click", function() {
     var button = this;
     var container = document.querySelector("#load-more-container");
     var page = this.dataset.page;
 
-    fetch("?page=" + page, {
+    // The other parameters of the page (the search query) are kept
+    var url = new URL(window.location.href);
+    url.searchParams.set("page", page);
+
+    fetch(url, {
     headers: {
         'X-Requested-With': 'XMLHttpRequest'
     }
@@ -12,7 +47,7 @@ document.querySelector("#load-more").addEventListener("click", function() {
 .then(data => {
     document.querySelector("#contents").insertAdjacentHTML('beforeend', data.html);
     if (data.has_next) {
-        button.dataset.page = Number(page) + 1;
+        button.dataset.page = data.next_page;
         container.style.display = 'block';
     } else {
         container.style.display = 'none';
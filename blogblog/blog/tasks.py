@@ -0,0 +1,340 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import Min, TextField, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .caching import bump_card_versions, bump_content_states, invalidate_user
+
+logger = logging.getLogger(__name__)
+
+# Side effects that the request does not wait for, such as the bookkeeping writes of the signal handlers,
+# are enqueued as tasks and run after the transaction commits. The TASKS_MODE setting selects where they run:
+#   - 'sync': in the request thread, right after the commit;
+#   - 'thread': in a pool of background threads of the same process, fed by a bounded queue;
+#   - 'db': stored in the Task table within the transaction and run by "python manage.py run_worker".
+# Task arguments must be JSON serializable, so that every task can run in every mode.
+
+
+def task(func):
+    """
+    Decorator that registers the function as a task.
+
+    The decorated function gets the `delay(*args, **kwargs)` attribute that enqueues a call of the function.
+
+    Args:
+        func (Callable): The function.
+
+    Returns:
+        Callable: The same function.
+    """
+
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    func.delay = partial(enqueue, func.task_name)
+    return func
+
+
+def run_task(name, args=(), kwargs=None):
+    """
+    Runs the task with the given name.
+
+    Args:
+        name (str): The dotted path of the task function.
+        args (list): Positional arguments of the task.
+        kwargs (dict): Keyword arguments of the task.
+
+    Returns:
+        None
+    """
+
+    func = import_string(name)
+    if getattr(func, 'task_name', None) != name:
+        raise ValueError(f'{name} is not a task')
+    func(*args, **(kwargs or {}))
+
+
+def enqueue(name, *args, **kwargs):
+    """
+    Enqueues a call of the task with the given name.
+
+    In the 'db' mode the task is stored immediately, so it is committed or rolled back together with the data
+    that caused it. In the other modes it is dispatched after the current transaction commits,
+    and dropped if the transaction is rolled back.
+
+    Args:
+        name (str): The dotted path of the task function.
+        *args: Positional arguments of the task.
+        **kwargs: Keyword arguments of the task.
+
+    Returns:
+        None
+    """
+
+    mode = settings.TASKS_MODE
+    if mode == 'db':
+        from .models import Task
+        Task.objects.create(name=name, args=list(args), kwargs=kwargs)
+    elif mode == 'thread':
+        transaction.on_commit(partial(get_executor().submit, name, args, kwargs))
+    else:
+        transaction.on_commit(partial(run_task, name, args, kwargs))
+
+
+class TaskExecutor:
+    """
+    Pool of daemon threads that run the tasks from a bounded queue.
+
+    When the queue is full, the task runs in the calling thread instead of being dropped, which slows down
+    the producer rather than losing the write. Each task closes its stale database connections,
+    because the worker threads do not go through the request cycle that normally does it.
+
+    Attributes:
+        - workers (int): The number of worker threads.
+        - queue (Queue): The queue of (task name, args, kwargs, enqueue time) items.
+        - processed (int): The number of tasks run by the workers.
+        - failed (int): The number of tasks that raised an exception.
+        - overflowed (int): The number of tasks run in the calling thread because the queue was full.
+        - lock (Lock): Guards the counters, which are updated from the worker and the calling threads.
+
+    Methods:
+        - submit(name, args, kwargs): Puts the task into the queue.
+        - get_stats(): Returns the queue depth, the lag and the counters.
+        - shutdown(timeout): Waits for the queued tasks to finish.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = self.failed = self.overflowed = 0
+        self.last_lag = 0.0
+        self.lock = threading.Lock()
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f'blog-tasks-{number}', daemon=True).start()
+
+    def submit(self, name, args, kwargs):
+        try:
+            self.queue.put_nowait((name, args, kwargs, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.overflowed += 1
+            logger.warning('The task queue is full, running %s in the calling thread', name)
+            run_task(name, args, kwargs)
+
+    def _work(self):
+        while True:
+            name, args, kwargs, enqueued = self.queue.get()
+            with self.lock:
+                self.last_lag = time.monotonic() - enqueued
+            failed = False
+            try:
+                run_task(name, args, kwargs)
+            except Exception:
+                failed = True
+                logger.exception('Task %s failed', name)
+            finally:
+                with self.lock:
+                    self.processed += 1
+                    self.failed += failed
+                close_old_connections()
+                self.queue.task_done()
+
+    def get_stats(self):
+        """
+        Returns the state of the queue.
+
+        Returns:
+            dict: The queue depth, the age of the oldest queued task and the lag of the last started task
+            in seconds, and the counters.
+        """
+
+        with self.queue.mutex:
+            oldest = self.queue.queue[0][3] if self.queue.queue else None
+            depth = len(self.queue.queue)
+        with self.lock:
+            return {
+                'mode': 'thread',
+                'depth': depth,
+                'oldest_age': time.monotonic() - oldest if oldest is not None else 0.0,
+                'last_lag': self.last_lag,
+                'processed': self.processed,
+                'failed': self.failed,
+                'overflowed': self.overflowed,
+            }
+
+    def shutdown(self, timeout):
+        """
+        Waits up to `timeout` seconds for the queued tasks to finish, so that a worker process restart
+        does not lose them.
+        """
+
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the task executor of the current process, creating it on first use.
+
+    Threads do not survive a fork, so a process forked from a parent that already had an executor
+    (e.g. gunicorn with preload_app) creates its own.
+
+    Returns:
+        TaskExecutor: The executor.
+    """
+
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor_pid != pid:
+        with _executor_lock:
+            if _executor_pid != pid:
+                _executor = TaskExecutor(settings.TASKS_WORKERS, settings.TASKS_QUEUE_SIZE)
+                _executor_pid = pid
+                atexit.register(_executor.shutdown, settings.TASKS_SHUTDOWN_TIMEOUT)
+    return _executor
+
+
+def get_stats():
+    """
+    Returns the state of the task queue of the current mode.
+
+    In the 'thread' mode the state belongs to the current process. In the 'db' mode it is read from the Task table.
+
+    Returns:
+        dict: The queue depth, the lag and the counters.
+    """
+
+    mode = settings.TASKS_MODE
+    if mode == 'thread':
+        return get_executor().get_stats()
+    if mode == 'db':
+        from .models import Task
+        pending = Task.objects.filter(attempts__lt=settings.TASKS_MAX_ATTEMPTS)
+        oldest = pending.aggregate(oldest=Min('date_time_create'))['oldest']
+        return {
+            'mode': 'db',
+            'depth': pending.count(),
+            'oldest_age': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+            'failed': Task.objects.filter(attempts__gte=settings.TASKS_MAX_ATTEMPTS).count(),
+        }
+    return {'mode': mode, 'depth': 0, 'oldest_age': 0.0}
+
+
+def get_retry_time(attempts):
+    """
+    Returns the time of the next attempt of a failed stored task, backing off exponentially.
+
+    Args:
+        attempts (int): The number of failed attempts.
+
+    Returns:
+        datetime: The time of the next attempt.
+    """
+
+    return timezone.now() + timedelta(seconds=settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+@task
+def record_author_activity(author_id, user_id, fields):
+    """
+    Writes the activity fields of the author with a single UPDATE.
+
+    Args:
+        author_id (int): The ID of the author.
+        user_id (int): The ID of the author's user, whose cached copy is dropped.
+        fields (dict): The names of the date fields and their values in ISO 8601 format.
+
+    Returns:
+        None
+    """
+
+    from .models import Author
+    Author.objects.filter(pk=author_id).update(**{name: parse_datetime(value) for name, value in fields.items()})
+    # QuerySet.update() does not send post_save, so the cached user (with the author) is dropped here,
+    # once the UPDATE is committed (the task runs in a transaction in the 'db' mode)
+    transaction.on_commit(partial(invalidate_user, user_id))
+
+
+@task
+def rebuild_excerpt(content_id):
+    """
+    Fills in the plain text, the excerpt and the search vector of the content from its HTML text.
+
+    Args:
+        content_id (int): The ID of the content.
+
+    Returns:
+        None
+    """
+
+    from .models import Content
+    from .search import get_search_vector, is_full_text_search_supported
+    content = Content.objects.filter(pk=content_id).only('id', 'text').first()
+    if content is None:
+        return
+    content.build_excerpt()
+    fields = {'plain_text': content.plain_text, 'excerpt': content.excerpt}
+    if is_full_text_search_supported():
+        # The UPDATE reads the old plain text from the row, so the new one is passed as a value
+        fields['search_vector'] = get_search_vector(Value(content.plain_text, output_field=TextField()))
+    Content.objects.filter(pk=content_id).update(**fields)
+    transaction.on_commit(partial(bump_card_versions, content_id))
+
+
+@task
+def update_search_vector(content_id):
+    """
+    Rebuilds the search vector of the content from its title and plain text. Does nothing if the database
+    does not support the full-text search.
+
+    Args:
+        content_id (int): The ID of the content.
+
+    Returns:
+        None
+    """
+
+    from .models import Content
+    from .search import get_search_vector, is_full_text_search_supported
+    if is_full_text_search_supported():
+        Content.objects.filter(pk=content_id).update(search_vector=get_search_vector())
+
+
+@task
+def invalidate_user_contents(user_id):
+    """
+    Invalidates the cached feed cards and pages that show the name of the user: the cards and the pages
+    of the contents of the user and the pages of the contents the user commented on.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        None
+    """
+
+    from .models import Content
+    contents = dict(Content.objects.filter(author__user_id=user_id).values_list('pk', 'slug'))
+    commented_slugs = (
+        Content.objects.filter(comment__author__user_id=user_id).values_list('slug', flat=True).distinct()
+    )
+    slugs = set(contents.values()) | set(commented_slugs)
+    if contents:
+        transaction.on_commit(partial(bump_card_versions, *contents))
+    if slugs:
+        transaction.on_commit(partial(bump_content_states, *slugs))
@@ -1,3 +1,737 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import signing
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blogblog.middleware import install_query_metrics, record_query, TimezoneMiddleware
+from blogblog.settings.base import cache_settings, CACHE_TIMEOUTS
+
+from .async_views import AsyncContentView, AsyncFeedView
+from .forms import UserSignUpForm
+from .caching import (attach_card_versions, get_card_version_key, get_content_page_key, bump_card_versions,
+                      get_feed_version, bump_feed_version, fragment_cache)
+from .models import Author, Content, Comment, Task
+from .pagination import CursorPaginator
+from .tasks import rebuild_excerpt
+
+# The tests run on the database of the settings. The checks that only make sense on PostgreSQL
+# (query plans, indexes) are skipped on other databases.
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def create_contents(author, count, **fields):
+    """
+    Creates `count` published contents of the author with the excerpts already built.
+
+    The contents are inserted with bulk_create, without the signal handlers and the background tasks.
+    """
+
+    return Content.objects.bulk_create([
+        Content(
+            title=f'Post {number}',
+            slug=f'post-{author.pk}-{number}',
+            text=f'<p>Text {number}</p>',
+            plain_text=f'Text {number}',
+            excerpt=f'Text {number}',
+            author=author,
+            **fields
+        )
+        for number in range(count)
+    ])
+
+
+@override_settings(TASKS_MODE='sync')
+class BlogTestCase(TestCase):
+    """
+    Base test case with a logged-in author and empty caches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'alice', 'alice@example.com', 'secret-password-1', first_name='Alice', last_name='Smith'
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.client.force_login(self.user)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL only')
+class QueryPlanTest(TestCase):
+    """
+    Checks that the hot queries use their indexes (see the check_query_plans command).
+
+    Run against a local PostgreSQL database: python manage.py test blog.tests.QueryPlanTest
+    """
+
+    def test_queries_use_indexes(self):
+        call_command('check_query_plans', stdout=StringIO())
+
+
+@override_settings(USER_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class QueryBudgetTest(BlogTestCase):
+    """
+    Checks the number of queries of the read paths, so that no lazy loading of the authors creeps back in.
+
+    The sessions and the users are cached, as in production with a shared cache.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create_user('bob', 'bob@example.com', 'secret-password-2', first_name='Bob')
+        create_contents(cls.user.author, 15)
+        create_contents(other.author, 15)
+        cls.content = Content.objects.filter(author=cls.user.author).order_by('id').first()
+        Comment.objects.bulk_create([
+            Comment(text=f'Comment {number}', author=(cls.user.author, other.author)[number % 2], content=cls.content)
+            for number in range(10)
+        ])
+
+    def test_feed_page(self):
+        # The budget of a feed page of 20 contents is 3 queries. The session is read from the cache (it is written
+        # through on login), the user with their author is loaded once and the contents come with their authors
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('feed'))
+        self.assertEqual(len(response.context['contents']), 20)
+        # The user is cached now
+        with self.assertNumQueries(1):
+            self.client.get(reverse('feed'))
+
+    def test_feed_page_with_session_from_database(self):
+        clear_caches()
+        # The session, the user with their author and the contents with their authors
+        with self.assertNumQueries(3):
+            self.client.get(reverse('feed'))
+
+    def test_feed_next_page(self):
+        next_page = self.client.get(reverse('feed')).context['next_page']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('feed'), {'page': next_page}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+        self.assertEqual(response.json()['has_next'], False)
+
+    def test_my_feed(self):
+        self.client.get(reverse('feed'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('my_content', kwargs={'username': self.user.username}))
+        self.assertEqual(len(response.context['contents']), 15)
+
+    def test_content_page(self):
+        self.client.get(reverse('feed'))
+        url = reverse('content', kwargs={'slug': self.content.slug})
+        # The state of the page, the content with its author, the previous and the next contents
+        # (one query with a UNION, two on SQLite) and the comments with their authors
+        neighbour_queries = 1 if connection.features.supports_slicing_ordering_in_compound else 2
+        with self.assertNumQueries(3 + neighbour_queries):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['comments']), 10)
+
+        Comment.objects.bulk_create([
+            Comment(text=f'More {number}', author=self.user.author, content=self.content) for number in range(10)
+        ])
+        clear_caches()
+        self.client.force_login(self.user)
+        self.client.get(reverse('feed'))
+        with self.assertNumQueries(3 + neighbour_queries):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['comments']), 20)
+
+
+class CommentCountTest(BlogTestCase):
+    """
+    Checks the comment counters maintained by the signal handlers and repaired by reconcile_comment_counts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.first, cls.second = create_contents(cls.user.author, 2)
+
+    def assert_counts(self, first, second):
+        self.assertEqual(
+            list(Content.objects.filter(pk__in=[self.first.pk, self.second.pk]).order_by('pk')
+                 .values_list('comment_count', flat=True)),
+            [first, second]
+        )
+
+    def test_create_and_delete(self):
+        comment = Comment.objects.create(text='Nice', author=self.user.author, content=self.first)
+        Comment.objects.create(text='Again', author=self.user.author, content=self.first)
+        self.assert_counts(2, 0)
+        comment.delete()
+        self.assert_counts(1, 0)
+
+    def test_move_to_other_content(self):
+        Comment.objects.create(text='Nice', author=self.user.author, content=self.first)
+        # As in the admin panel, the comment is loaded and saved with another content
+        comment = Comment.objects.get()
+        comment.content = self.second
+        comment.save()
+        self.assert_counts(0, 1)
+        # Saving it again changes nothing
+        comment.save()
+        self.assert_counts(0, 1)
+
+    def test_reconcile(self):
+        Comment.objects.bulk_create([
+            Comment(text=f'Comment {number}', author=self.user.author, content=self.first) for number in range(3)
+        ])
+        Content.objects.filter(pk=self.second.pk).update(comment_count=5)
+        stdout = StringIO()
+        call_command('reconcile_comment_counts', '--dry-run', stdout=stdout)
+        self.assertIn('2 comment counters have drifted.', stdout.getvalue())
+        self.assert_counts(0, 5)
+        call_command('reconcile_comment_counts', stdout=StringIO())
+        self.assert_counts(3, 0)
+
+
+class SignUpTest(TestCase):
+    """
+    Checks that a signup inserts the user and the author once each and draws the username number only on save.
+    """
+
+    data = {
+        'first_name': 'Carol',
+        'last_name': 'Jones',
+        'email': 'carol@example.com',
+        'password1': 'secret-password-3',
+        'password2': 'secret-password-3',
+        'agree_to_terms': True,
+    }
+
+    def get_form(self):
+        form = UserSignUpForm(self.data)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def test_one_insert_per_table(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('signup'), self.data)
+        self.assertEqual(response.status_code, 302)
+        for table in ('auth_user', 'blog_author'):
+            inserts = [query for query in context.captured_queries if query['sql'].startswith(f'INSERT INTO "{table}"')]
+            self.assertEqual(len(inserts), 1, table)
+        # The username is not set by a second write after the insert
+        self.assertFalse([query for query in context.captured_queries if '"username"' in query['sql']
+                          and query['sql'].startswith('UPDATE')])
+        self.assertTrue(User.objects.get(email='carol@example.com').username.startswith('carol-jones-'))
+
+    def test_commit_false_draws_no_number(self):
+        form = self.get_form()
+        with mock.patch('blog.forms.get_next_username_number') as get_number, self.assertNumQueries(0):
+            user = form.save(commit=False)
+        get_number.assert_not_called()
+        self.assertIsNone(user.pk)
+
+    @skipUnless(connection.vendor != 'postgresql', 'The numbers of the PostgreSQL sequence are unique')
+    def test_retry_on_taken_number(self):
+        User.objects.create_user('carol-jones-7', 'other@example.com')
+        form = self.get_form()
+        with mock.patch('blog.forms.get_next_username_number', side_effect=[7, 8]):
+            user = form.save()
+        self.assertEqual(user.username, 'carol-jones-8')
+
+
+class CursorPaginationTest(BlogTestCase):
+    """
+    Checks the cursor pagination of the feed: invalid cursors and ties of the creation time.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_contents(cls.user.author, 25)
+        # All the contents are created at the same time, so only the ID orders them
+        Content.objects.update(date_time_create=timezone.now())
+
+    def test_invalid_cursor_is_not_found(self):
+        cursor = self.client.get(reverse('feed')).context['next_page']
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        wrong_shape = signing.dumps(['not a date'], salt=CursorPaginator.salt)
+        for page in ('garbage', '../../', tampered, wrong_shape):
+            with self.subTest(page=page):
+                response = self.client.get(reverse('feed'), {'page': page}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                self.assertEqual(response.status_code, 404)
+
+    def test_cursors_walk_ties_once(self):
+        paginator = CursorPaginator(Content.objects.all(), 4, ('-date_time_create', '-id'))
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(content.pk for content in page)
+            if not page.has_next():
+                break
+            cursor = page.next_page_number()
+        self.assertEqual(seen, sorted(Content.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_next_page_round_trip(self):
+        response = self.client.get(reverse('feed'))
+        seen = [content.pk for content in response.context['contents']]
+        next_page = response.context['next_page']
+        while next_page:
+            response = self.client.get(reverse('feed'), {'page': next_page}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            data = response.json()
+            seen.extend(content.pk for content in response.context['contents'])
+            next_page = data['next_page']
+            self.assertEqual(data['has_next'], next_page is not None)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+
+class TimezoneTest(BlogTestCase):
+    """
+    Checks that the time zone of the 'timezone' cookie is activated and a malformed cookie falls back to UTC.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(timezone.deactivate)
+
+    def get_timezone_name(self, cookie):
+        request = RequestFactory().get('/')
+        request.COOKIES['timezone'] = cookie
+        return TimezoneMiddleware(lambda request: timezone.get_current_timezone_name())(request)
+
+    def test_valid_timezone(self):
+        self.assertEqual(self.get_timezone_name('Europe/Berlin'), 'Europe/Berlin')
+
+    def test_invalid_timezone(self):
+        for cookie in ('../../etc/passwd', 'Not/AZone', '', 'Europe/Berlin\x00'):
+            with self.subTest(cookie=cookie):
+                self.assertEqual(self.get_timezone_name(cookie), 'UTC')
+                self.client.cookies['timezone'] = cookie
+                self.assertEqual(self.client.get(reverse('feed')).status_code, 200)
+
+
+class SearchTest(BlogTestCase):
+    """
+    Checks the search of the published contents (the substring fallback outside of PostgreSQL).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_contents(cls.user.author, 25)
+        Content.objects.filter(title='Post 3').update(title='Gardening')
+        Content.objects.filter(title='Post 4').update(plain_text='Notes on gardening')
+        Content.objects.filter(title='Post 5').update(title='Hidden gardening', is_published=False)
+
+    def search(self, query, **params):
+        return self.client.get(reverse('search'), {'q': query, **params})
+
+    def test_title_matches_first_and_unpublished_excluded(self):
+        titles = [content.title for content in self.search('gardening').context['contents']]
+        self.assertEqual(titles, ['Gardening', 'Post 4'])
+
+    def test_load_more(self):
+        response = self.search('text')
+        self.assertEqual(len(response.context['contents']), 20)
+        next_page = response.context['next_page']
+        response = self.client.get(
+            reverse('search'), {'q': 'text', 'page': next_page}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        data = response.json()
+        self.assertEqual(set(data), {'html', 'has_next', 'next_page'})
+        self.assertEqual(data['has_next'], False)
+        self.assertIsNone(data['next_page'])
+        # Of the 25 contents, one is not published and one has another text
+        self.assertEqual(len(response.context['contents']), 3)
+
+    def test_nothing_found(self):
+        self.assertContains(self.search('nonexistent'), 'Nothing found.')
+        self.assertEqual(list(self.search(' ').context['contents']), [])
+
+
+class ContentSaveTest(BlogTestCase):
+    """
+    Checks that a loaded content writes only its changed fields.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.content = create_contents(cls.user.author, 1)[0]
+
+    def get_content(self):
+        # Loaded like in change_content_status(): filtered by the author, which is then reused
+        content = Content.objects.get(slug=self.content.slug, author=self.user.author)
+        content.author = self.user.author
+        return content
+
+    def test_publish_toggle_is_one_update(self):
+        content = self.get_content()
+        for toggle, is_published in ((content.unpublish, False), (content.publish, True)):
+            with self.assertNumQueries(1), CaptureQueriesContext(connection) as context:
+                toggle()
+            sql = context.captured_queries[0]['sql']
+            # One column is written
+            self.assertTrue(sql.startswith('UPDATE "blog_content" SET "is_published" = '), sql)
+            self.assertNotIn(',', sql.split(' WHERE ')[0])
+            self.assertEqual(Content.objects.get(pk=content.pk).is_published, is_published)
+
+    def test_save_without_changes_has_no_queries(self):
+        content = self.get_content()
+        with self.assertNumQueries(0):
+            content.save()
+
+    def test_stale_instance_keeps_comment_count(self):
+        content = self.get_content()
+        Comment.objects.create(text='Nice', author=self.user.author, content=self.content)
+        content.title = 'New title'
+        content.save()
+        content = Content.objects.get(pk=content.pk)
+        self.assertEqual((content.title, content.comment_count), ('New title', 1))
+
+
+class FeedCardCacheTest(BlogTestCase):
+    """
+    Checks that a cached feed card is reused when the card moves to another page of the feed.
+    """
+
+    def test_card_is_reused_on_next_page(self):
+        create_contents(self.user.author, 20)
+        self.client.get(reverse('feed'))
+        # Changed without the signal handlers, so the cards keep their versions
+        Content.objects.update(title='Renamed')
+        other = User.objects.create_user('bob', 'bob@example.com', 'secret-password-2')
+        create_contents(other.author, 1)
+
+        next_page = self.client.get(reverse('feed')).context['next_page']
+        response = self.client.get(reverse('feed'), {'page': next_page}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertIn('Post 0', response.json()['html'])
+
+
+class ContentStateTest(BlogTestCase):
+    """
+    Checks that the HTTP validators and the cached pages of a content change with everything the page shows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.commenter = User.objects.create_user('bob', 'bob@example.com', 'secret-password-2', first_name='Bob')
+        cls.content = create_contents(cls.user.author, 1)[0]
+        Comment.objects.create(text='Nice', author=cls.commenter.author, content=cls.content)
+
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+        self.url = reverse('content', kwargs={'slug': self.content.slug})
+
+    def rename(self, user, first_name):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = first_name
+            user.save()
+
+    def assert_page_changed(self, etag, name):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, name)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_author_renamed(self):
+        etag = self.client.get(self.url)['ETag']
+        self.rename(self.user, 'Alicia')
+        self.assert_page_changed(etag, 'Alicia')
+
+    def test_commenter_renamed(self):
+        etag = self.client.get(self.url)['ETag']
+        self.rename(self.commenter, 'Robert')
+        self.assert_page_changed(etag, 'Robert')
+
+
+class AsyncViewTest(BlogTestCase):
+    """
+    Checks the async views, which call the cache through its async methods.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.content = create_contents(cls.user.author, 3)[1]
+
+    def get_request(self, url, headers=None):
+        request = AsyncRequestFactory().get(url, headers=headers)
+        request.session = SessionStore()
+        return request
+
+    async def test_content_page(self):
+        url = reverse('content', kwargs={'slug': self.content.slug})
+        view = AsyncContentView.as_view()
+        response = await view(self.get_request(url), slug=self.content.slug)
+        self.assertContains(response, self.content.title)
+        self.assertIsNotNone(await fragment_cache.aget(get_content_page_key(response['ETag'])))
+
+        cached = await view(self.get_request(url), slug=self.content.slug)
+        self.assertEqual(cached.content, response.content)
+        not_modified = await view(self.get_request(url, {'If-None-Match': response['ETag']}), slug=self.content.slug)
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_feed_page(self):
+        response = await AsyncFeedView.as_view()(self.get_request(reverse('feed')))
+        self.assertContains(response, self.content.title)
+
+
+@override_settings(DB_METRICS=True)
+class ConnectionMetricsTest(BlogTestCase):
+    """
+    Checks that the Server-Timing header counts the queries of the request, also when they run in the threads
+    of sync_to_async under ASGI.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_contents(cls.user.author, 3)
+
+    def setUp(self):
+        super().setUp()
+        # The connection of the test database was opened before the middleware was loaded
+        install_query_metrics(None, connection)
+        self.addCleanup(connection.execute_wrappers.remove, record_query)
+
+    def test_sync_request(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('feed'))
+        self.assertIn(f'desc="{len(context)} queries"', response['Server-Timing'])
+
+    async def test_async_request(self):
+        # The middleware runs in the event loop and the sync views and their queries run in a thread
+        response = await AsyncClient().get(reverse('feed'))
+        self.assertIn('desc="1 query"', response['Server-Timing'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DB_REPLICA_LAG_CHECK_INTERVAL=0)
+class ReplicaRoutingTest(BlogTestCase):
+    """
+    Checks the routing of the reads with a second SQLite database as the replica.
+
+    The replica is a separate database with different contents, so the page shows where it was read from.
+    It is added to the connections when the class is set up, after the test runner checked the databases.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        connections.settings['replica'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory.name, 'replica.sqlite3'),
+            },
+        })['replica']
+        cls.addClassCleanup(connections.settings.pop, 'replica')
+        cls.addClassCleanup(connections.__delitem__, 'replica')
+        cls.addClassCleanup(connections['replica'].close)
+        call_command('migrate', database='replica', run_syncdb=True, verbosity=0)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.content = create_contents(cls.user.author, 1)[0]
+        Content.objects.filter(pk=cls.content.pk).update(title='Primary post')
+        # The replica gets the same user and author (without the signal handlers) and its own content
+        User.objects.using('replica').bulk_create([User.objects.get(pk=cls.user.pk)])
+        Author.objects.using('replica').bulk_create([Author.objects.get(user=cls.user)])
+        Content.objects.using('replica').bulk_create([
+            Content(pk=cls.content.pk + 1, title='Replica post', slug='replica-post', text='<p>Text</p>',
+                    excerpt='Text', author_id=cls.user.author.pk)
+        ])
+
+    def assert_read_from(self, database):
+        response = self.client.get(reverse('feed'))
+        self.assertContains(response, f'{database} post')
+
+    def test_feed_is_read_from_replica(self):
+        self.assert_read_from('Replica')
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.post(reverse('content', kwargs={'slug': self.content.slug}), {'text': 'Nice'})
+        self.assertIn('primary_db', response.cookies)
+        self.assert_read_from('Primary')
+        # The other users still read from the replica (the logout drops the cookies of the client)
+        self.client.logout()
+        self.assert_read_from('Replica')
+
+    def test_request_without_write_does_not_pin(self):
+        self.client.logout()
+        response = self.client.post(reverse('login'), {'username': 'alice', 'password': 'wrong'})
+        self.assertNotIn('primary_db', response.cookies)
+        self.assert_read_from('Replica')
+
+    @override_settings(DB_REPLICA_MAX_LAG=-1)
+    def test_lagging_replica_is_skipped(self):
+        self.assert_read_from('Primary')
+
+
+class SearchSuggestionTest(BlogTestCase):
+    """
+    Checks the title suggestions, the newest matching titles first.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_contents(cls.user.author, 12)
+
+    def get_suggestions(self, query):
+        response = self.client.get(reverse('search_suggest'), {'q': query}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return [result['title'] for result in response.json()['results']]
+
+    def test_newest_titles_first(self):
+        self.assertEqual(self.get_suggestions('post 1'), ['Post 11', 'Post 10', 'Post 1'])
+        self.assertEqual(self.get_suggestions('po'), [f'Post {number}' for number in range(11, 3, -1)])
+
+    def test_empty_query(self):
+        self.assertEqual(self.get_suggestions(' '), [])
+
+
+class CacheBackendTest(TestCase):
+    """
+    Checks the named caches and the caching helpers on the local-memory and the file-based backends,
+    which need no external service.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backends = {'locmem': '', 'file': directory.name}
+
+    def get_caches(self, backend, version=1):
+        caches_settings = {
+            alias: cache_settings(alias, timeout, backend, self.backends[backend])
+            for alias, timeout in CACHE_TIMEOUTS.items()
+        }
+        for cache_config in caches_settings.values():
+            cache_config['VERSION'] = version
+        return caches_settings
+
+    def test_named_caches_are_separate(self):
+        for backend in self.backends:
+            with self.subTest(backend=backend), override_settings(CACHES=self.get_caches(backend)):
+                clear_caches()
+                for alias in CACHE_TIMEOUTS:
+                    caches[alias].set('key', alias)
+                for alias in CACHE_TIMEOUTS:
+                    self.assertEqual(caches[alias].get('key'), alias)
+
+    def test_version_invalidates_keys(self):
+        for backend in self.backends:
+            with self.subTest(backend=backend):
+                with override_settings(CACHES=self.get_caches(backend)):
+                    clear_caches()
+                    cache.set('key', 'value')
+                with override_settings(CACHES=self.get_caches(backend, version=2)):
+                    self.assertIsNone(cache.get('key'))
+
+    def test_versions(self):
+        contents = [Content(pk=1), Content(pk=2)]
+        for backend in self.backends:
+            with self.subTest(backend=backend), override_settings(CACHES=self.get_caches(backend)):
+                clear_caches()
+                feed_version = get_feed_version()
+                self.assertEqual(get_feed_version(), feed_version)
+                bump_feed_version()
+                self.assertNotEqual(get_feed_version(), feed_version)
+
+                attach_card_versions(contents)
+                first, second = (content.card_version for content in contents)
+                bump_card_versions(1)
+                attach_card_versions(contents)
+                self.assertNotEqual(contents[0].card_version, first)
+                self.assertEqual(contents[1].card_version, second)
+
+                fragment_cache.set('fragment', b'<p>page</p>')
+                self.assertEqual(fragment_cache.get('fragment'), b'<p>page</p>')
+
+    def test_cache_health(self):
+        for backend in self.backends:
+            with self.subTest(backend=backend), override_settings(CACHES=self.get_caches(backend)):
+                stdout = StringIO()
+                call_command('cache_health', stdout=stdout)
+                output = stdout.getvalue()
+                for alias in CACHE_TIMEOUTS:
+                    self.assertIn(f'{alias}: ', output)
+                    # The probe reads the written key (a hit) and the deleted one (a miss)
+                    self.assertRegex(output, rf'{alias}: .* hits=[1-9]\d* misses=[1-9]\d* ')
+                self.assertIn('All caches are available.', output)
+
+
+class UserCacheTest(BlogTestCase):
+    """
+    Checks that a user changed in another process (without the signal handlers of this one) is not served
+    from a per-process cache, and that the post cooldown does not rely on the cached author.
+    """
+
+    @override_settings(USER_CACHE=False)
+    def test_deactivated_user_is_logged_out(self):
+        self.assertTrue(self.client.get(reverse('feed')).context['user'].is_authenticated)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(self.client.get(reverse('feed')).context['user'].is_authenticated)
+
+    @override_settings(USER_CACHE=True)
+    def test_user_is_cached_in_shared_cache(self):
+        self.client.get(reverse('feed'))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('feed'))
+        self.assertFalse([query for query in context.captured_queries if 'FROM "auth_user"' in query['sql']])
+
+    @override_settings(USER_CACHE=True)
+    def test_post_cooldown_is_read_from_database(self):
+        # Cache the user with the author that has not posted yet
+        self.client.get(reverse('feed'))
+        # The post is created without the signal handlers, like a post whose activity task has not run yet
+        create_contents(self.user.author, 1)
+        response = self.client.post(reverse('create_content'), {'title': 'Second', 'text': '<p>Second post</p>'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'You can post content again in')
+        self.assertEqual(Content.objects.filter(author=self.user.author).count(), 1)
+
+
+@override_settings(TASKS_MODE='db')
+class WorkerTest(BlogTestCase):
+    """
+    Checks that the stored tasks are run by the worker and that their cache side effects wait for the commit.
+    """
+
+    def test_task_side_effects_run_on_commit(self):
+        content = create_contents(self.user.author, 1)[0]
+        Content.objects.filter(pk=content.pk).update(excerpt='')
+        key = get_card_version_key(content.pk)
+        cache.set(key, 1, None)
+        rebuild_excerpt.delay(content.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('run_worker', '--once', stdout=StringIO())
+            # The UPDATE of the task is not committed yet, so the card still has its old version
+            self.assertEqual(cache.get(key), 1)
+        self.assertNotEqual(cache.get(key), 1)
+        self.assertFalse(Task.objects.exists())
+        content.refresh_from_db()
+        self.assertEqual(content.excerpt, 'Text 0')
@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.views import PasswordChangeView
 from django.urls import path
 
 from . import views
 
+# The feed, the search and the article pages are served by async views under ASGI
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncFeedView as FeedView, AsyncSearchView as SearchView, AsyncContentView as ContentView
+else:
+    from .views import FeedView, SearchView, ContentView
+
 urlpatterns = [
     path('', views.index, name='main'),
-    path('feed', views.FeedView.as_view(), name='feed'),
-    path('feed/<slug:slug>', views.ContentView.as_view(), name='content'),
+    path('feed', FeedView.as_view(), name='feed'),
+    path('search', SearchView.as_view(), name='search'),
+    path('search/suggest', views.SearchSuggestView.as_view(), name='search_suggest'),
+    path('feed/<slug:slug>', ContentView.as_view(), name='content'),
     path('feed/<slug:slug>/edit', views.UpdateContentView.as_view(), name='update'),
     path('feed/<slug:slug>/unpublish', views.unpublish_content, name='unpublish'),
     path('feed/<slug:slug>/publish', views.publish_content, name='publish'),
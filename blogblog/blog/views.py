@@ -1,22 +1,34 @@
+import time
 from datetime import timedelta
+from hashlib import md5
 from urllib.parse import urlencode
 
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import login, authenticate, update_session_auth_hash
+from django.contrib.auth import login, update_session_auth_hash
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView
-from django.db.models import Count
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponseRedirect, HttpResponse, JsonResponse, Http404
 from django.shortcuts import redirect, get_object_or_404, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views import View
 from django.views.generic import FormView, ListView, DetailView, CreateView, UpdateView
 
+from .caching import (get_content_neighbours, attach_card_versions, get_feed_version, get_content_state_key,
+                      get_content_page, set_content_page, get_search_suggestions, CARD_TIMEOUT,
+                      CONTENT_STATE_TIMEOUT)
 from .forms import UserSignUpForm, UserLogInForm, CommentForm, ContentForm, UserEditForm, UserPasswordChangeForm
 from .models import Content, Comment
+from .pagination import CursorPaginator
+from .search import search_contents
 
 
 def index(request):
@@ -163,7 +175,7 @@ class UserSignUpView(SuccessUrlRedirectMixin, FormView):
         """
 
         user = form.save()
-        login(self.request, user)
+        login(self.request, user, backend='blog.backends.EmailBackend')
         next_url = self.request.GET.get('next', reverse('feed'))
         return redirect(next_url)
 
@@ -194,36 +206,19 @@ class UserLogInView(SuccessUrlRedirectMixin, LoginView):
         """
         Handles the validation of the login form.
 
-        Retrieves the email and password from the form's cleaned data.
-        Attempts to retrieve the username associated with the given email.
-        Authenticates the user with the provided username and password.
-        If the user is successfully authenticated, logs in the user and redirects to the 'main' page.
-        Otherwise, the form is considered invalid.
+        The form has already found the user by the email and checked the password,
+        so the user is logged in with EmailBackend without authenticating again.
+        Redirects to the 'next' URL or to the 'main' page.
 
         Args:
             form (UserLogInForm): The form instance.
 
         Returns:
-            HttpResponseRedirect: A redirect response to the 'main' page if the user is authenticated.
-            HttpResponse: The rendered form with errors if the user is not authenticated.
+            HttpResponseRedirect: A redirect response to the 'main' page.
         """
 
-        email = form.cleaned_data.get('email')
-        password = form.cleaned_data.get('password')
-        username = User.objects.get(email=email).username
-        user = authenticate(
-            self.request,
-            username=username,
-            password=password
-        )
-        if user is None:
-            form.add_error(None, 'Authentication failed')
-            return self.form_invalid(form)
-        elif user.is_authenticated:
-            login(self.request, user)
-            return redirect(self.request.GET.get('next', reverse('main')))
-        else:
-            return self.form_invalid(form)
+        login(self.request, form.get_user(), backend='blog.backends.EmailBackend')
+        return redirect(self.request.GET.get('next', reverse('main')))
 
 
 class UserEditView(View):
@@ -354,9 +349,13 @@ class FeedView(AuthenticationRedirectMixin, ListView):
         context_object_name (str): The name of the variable to use in the template for the list of objects.
         login_url (str): The URL to redirect to for anonymous users.
         paginate_by (int): The number of items to display per page.
+        pagination_mode (str): 'cursor' for keyset pagination or 'page' for numbered pages.
+        feed_ordering (tuple): The ordering of the feed. The last field is unique, so the ordering is total.
+        use_read_replica (bool): The feed is read from a replica if there is one (see blogblog/routers.py).
 
     Methods:
         get_queryset(): Returns the queryset of feed content to be displayed.
+        paginate_queryset(queryset, page_size): Paginates the queryset according to the pagination mode.
         get_context_data(**kwargs): Adds additional context data to be used in the template.
         get_template_names(): Returns the template names based on the request type.
     """
@@ -365,32 +364,65 @@ class FeedView(AuthenticationRedirectMixin, ListView):
     context_object_name = 'contents'
     login_url = 'login'
     paginate_by = 20
+    pagination_mode = settings.FEED_PAGINATION_MODE
+    feed_ordering = ('-date_time_create', '-id')
+    use_read_replica = True
 
     def get_queryset(self):
         """
         Returns the queryset of feed content to be displayed.
 
         Filters the content by 'is_published' and orders it by the 'date_time_create' field in descending order.
-        Counts the number of comments on a post
+        The authors and their users are joined in the same query, since their names are displayed on every card.
+        The full text is not needed for the feed, since the stored excerpt is displayed.
 
         Returns:
             QuerySet: The filtered and ordered queryset of feed content.
         """
 
-        queryset = self.model.objects.filter(is_published=True).order_by('-date_time_create')
-        queryset = queryset.annotate(comment_count=Count('comment'))
+        queryset = self.model.objects.filter(is_published=True).order_by(*self.feed_ordering)
+        queryset = queryset.select_related('author__user').defer('text', 'plain_text')
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginates the queryset according to the pagination mode.
+
+        In the 'cursor' mode, the 'page' GET parameter holds an opaque cursor instead of a page number.
+        The page is fetched by a keyset condition on the feed ordering with one extra row instead of
+        COUNT(*) and OFFSET, so the cost of a page does not depend on how deep the user has scrolled.
+        In the 'page' mode, the default Django pagination is used.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            page_size (int): The number of items per page.
+
+        Returns:
+            tuple: The paginator, the page, the list of objects of the page and the flag of pagination.
+
+        Raises:
+            Http404: If the cursor is invalid.
+        """
+
+        if self.pagination_mode != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.feed_ordering)
+        cursor = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg)
+        try:
+            page = paginator.page(cursor)
+        except InvalidPage as error:
+            raise Http404(f'Invalid page: {error}')
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         """
         Adds additional context data to be used in the template.
 
-        Adds the current number of feed page number to the context.
-        This is necessary for the subsequent storage of the page number in the GET parameter of the link.
-
-        The method also updates the `short_text` attribute of each content item
-        in the `contents` queryset. It calls the `short_text` method of the `Content`
-        model, which returns a shortened version of the article text.
+        Adds the current feed page (its number or cursor) and the next page to the context.
+        The current page is stored in the GET parameter of the publish and unpublish links, which are not cached:
+        the cached feed cards do not depend on the page, so a card is reused on whichever page it appears.
+        Adds the versions of the cached feed cards to the contents.
         Adds the 'title' attribute to the context data.
 
         Args:
@@ -401,11 +433,13 @@ class FeedView(AuthenticationRedirectMixin, ListView):
         """
 
         context = super().get_context_data(**kwargs)
-        context['feed_page'] = context['page_obj'].number
+        page = context['page_obj']
+        attach_card_versions(context['contents'])
+        context['card_cache_timeout'] = CARD_TIMEOUT
+        context['feed_page'] = page.number or ''
         context['title'] = 'Feed'
-        for content in context['contents']:
-            content.short_text = content.short_text(250)
-        context['has_next'] = context['page_obj'].has_next()
+        context['has_next'] = page.has_next()
+        context['next_page'] = page.next_page_number() if page.has_next() else None
 
         return context
 
@@ -415,6 +449,9 @@ class FeedView(AuthenticationRedirectMixin, ListView):
 
         If the request is made via XMLHttpRequest (AJAX), it returns a partial template.
         Otherwise, it returns the regular feed template.
+        The partial template is a fragment of a page that has already been rendered, so the page-level
+        context processors are not run for it; it only gets the request, which it needs for the links
+        of the author.
 
         Args:
             context (dict): The context data for rendering the template.
@@ -425,10 +462,11 @@ class FeedView(AuthenticationRedirectMixin, ListView):
         """
 
         if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            html = render_to_string('blog/includes/partial_feed.html', context)
+            html = render_to_string('blog/includes/partial_feed.html', {**context, 'request': self.request})
             return JsonResponse({
                 'html': html,
                 'has_next': context['has_next'],
+                'next_page': context['next_page'],
             })
         else:
             return super().render_to_response(context, **response_kwargs)
@@ -465,14 +503,14 @@ class MyFeedView(LoginRequiredMixin, FeedView):
         Returns the queryset of user's feed content to be displayed.
 
         Filters the content by the current user's author and orders it by the 'date_time_create' field in descending order.
-        Counts the number of comments on a post
+        The authors and their users are joined in the same query.
 
         Returns:
             QuerySet: The filtered and ordered queryset of user's feed content.
         """
 
-        queryset = self.model.objects.filter(author=self.request.user.author).order_by('-date_time_create')
-        queryset = queryset.annotate(comment_count=Count('comment'))
+        queryset = self.model.objects.filter(author=self.request.user.author).order_by(*self.feed_ordering)
+        queryset = queryset.select_related('author__user').defer('text', 'plain_text')
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -490,6 +528,109 @@ class MyFeedView(LoginRequiredMixin, FeedView):
         return context
 
 
+class SearchView(FeedView):
+    """
+    A view for searching the published content by the words of the title and the text.
+
+    The results are ordered by the rank of the match and paginated with cursors, like the feed; the AJAX requests
+    get the next page in the JSON of the feed. See "blog/search.py" for the search itself.
+
+    Attributes:
+        pagination_mode (str): Always 'cursor': the cursor stores the rank of the last result.
+        feed_ordering (tuple): The results are ordered by the rank, the ID makes the ordering total.
+
+    Methods:
+        get_search_query(): Returns the search query from the 'q' GET parameter.
+        get_queryset(): Returns the queryset of the matching content.
+        get_context_data(**kwargs): Adds the search query to the context.
+        get_template_names(): Returns the template names based on the request type.
+    """
+
+    pagination_mode = 'cursor'
+    feed_ordering = ('-rank', '-id')
+
+    def get_search_query(self):
+        """
+        Returns the search query from the 'q' GET parameter.
+
+        Returns:
+            str: The search query without the surrounding whitespace.
+        """
+
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        """
+        Returns the queryset of the published content that matches the search query, with the rank of the match.
+
+        Returns:
+            QuerySet: The matching content, empty if there is no query.
+        """
+
+        queryset = search_contents(self.model.objects.filter(is_published=True), self.get_search_query())
+        queryset = queryset.select_related('author__user').defer('text', 'plain_text', 'search_vector')
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        """
+        Adds the search query to the context and sets the 'title' attribute.
+
+        The cursor of a search page cannot be used as a feed page, so the links of the cards do not carry it.
+
+        Returns:
+            dict: The context data for rendering the view.
+        """
+
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Search'
+        context['search_query'] = self.get_search_query()
+        context['feed_page'] = ''
+        return context
+
+    def get_template_names(self):
+        """
+        Returns the template names based on the request type.
+
+        Returns:
+            list: The list of template names.
+        """
+
+        if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return ['blog/includes/partial_feed.html']
+        return ['blog/search.html']
+
+
+class SearchSuggestView(View):
+    """
+    A view that suggests the titles of the published content while the search query is typed.
+
+    The AJAX requests get the titles and the slugs of the newest matching articles as JSON,
+    e.g. {"results": [{"title": "...", "slug": "..."}]}. Other requests are redirected to the full search.
+
+    Attributes:
+        use_read_replica (bool): The suggestions are read from a replica if there is one (see blogblog/routers.py).
+
+    Methods:
+        get(request, *args, **kwargs): Returns the suggestions for the 'q' GET parameter.
+    """
+
+    http_method_names = ['get', 'head', 'options']
+    use_read_replica = True
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the suggestions for the 'q' GET parameter.
+
+        Returns:
+            JsonResponse or HttpResponseRedirect: The suggestions, or the redirect to the search page.
+        """
+
+        query = request.GET.get('q', '')
+        if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+            return redirect(f"{reverse('search')}?{urlencode({'q': query})}")
+        return JsonResponse({'results': get_search_suggestions(query)})
+
+
 class ContentView(AuthenticationRedirectMixin, DetailView):
     """
     This class-based view displays the detailed view of a content object and handles adding comments to the content.
@@ -501,57 +642,214 @@ class ContentView(AuthenticationRedirectMixin, DetailView):
         model (Model): The model class representing the content objects.
         template_name (str): The name of the template used to render the content view.
         context_object_name (str): The name of the context variable containing the content object.
+        use_read_replica (bool): The page is read from a replica if there is one (see blogblog/routers.py).
 
     Methods:
+        get(self, request, *args, **kwargs): Handles the HTTP GET request with conditional GET and the page cache.
+        get_content_state(self): Returns the cached state of the content that the validators are built from.
+        get_content_state_queryset(self): Returns the queryset the state of the content is built from.
+        build_content_state(content): Builds the state of the content with a new version token.
+        get_etag(self, state, feed_version): Returns the ETag of the page for the current request.
+        get_queryset(self): Returns the queryset of the content objects with their authors.
         get_context_data(self, **kwargs): Returns the context data for rendering the content view.
+        get_comments_queryset(self): Returns the queryset of the comments of the content.
+        get_page_context(self, neighbours): Returns the context data that does not need database queries.
         post(self, request, *args, **kwargs): Handles the HTTP POST request for adding comments to the content.
     """
 
     model = Content
     template_name = 'blog/content.html'
     context_object_name = 'content'
+    use_read_replica = True
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles the HTTP GET request for the content page.
+
+        The ETag and Last-Modified validators are built from the cached state of the content,
+        so a repeated request gets 304 Not Modified without rendering the page.
+        Pages for anonymous users are the same for everyone and are served from the cache,
+        authenticated users always get a freshly rendered page.
+
+        Args:
+            request (HttpRequest): The request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            HttpResponse: The content page or the 304 Not Modified response.
+        """
+
+        state = self.get_content_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = self.get_etag(state, get_feed_version())
+        last_modified = int(state['last_modified'].timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            if request.user.is_authenticated:
+                response = super().get(request, *args, **kwargs)
+            else:
+                page = get_content_page(etag)
+                if page is None:
+                    response = super().get(request, *args, **kwargs)
+                    response.render()
+                    set_content_page(etag, response.content)
+                else:
+                    response = HttpResponse(page)
+
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_content_state(self):
+        """
+        Returns the state of the content that the HTTP validators are built from.
+
+        The state contains the last time the content or its comments changed and a version token.
+        It is cached until the content is saved or commented on, or the name of the author of the content
+        or of a comment changes (see the signal handlers in "blog/signals.py"), for at most CONTENT_STATE_TIMEOUT.
+
+        Returns:
+            dict: The state of the content, or None if the content does not exist.
+        """
+
+        key = get_content_state_key(self.kwargs[self.slug_url_kwarg])
+        state = cache.get(key)
+        if state is None:
+            state = self.build_content_state(self.get_content_state_queryset().first())
+            if state is None:
+                return None
+            cache.set(key, state, CONTENT_STATE_TIMEOUT)
+        return state
+
+    def get_content_state_queryset(self):
+        """
+        Returns the queryset of the last edit date of the content and the date of its last comment.
+
+        Returns:
+            QuerySet: The queryset of one dictionary.
+        """
+
+        return (
+            self.model.objects
+            .filter(slug=self.kwargs[self.slug_url_kwarg])
+            .values('pk', 'date_time_edit')
+            .annotate(last_comment=Max('comment__date_time_create'))
+            .order_by('pk')
+        )
+
+    @staticmethod
+    def build_content_state(content):
+        """
+        Builds the state of the content with a new version token.
+
+        Args:
+            content (dict): The row of the content state queryset, or None.
+
+        Returns:
+            dict: The state of the content, or None if the content does not exist.
+        """
+
+        if content is None:
+            return None
+        return {
+            'last_modified': max(filter(None, [content['date_time_edit'], content['last_comment']])),
+            'version': time.time_ns(),
+        }
+
+    def get_etag(self, state, feed_version):
+        """
+        Returns the ETag of the content page for the current request.
+
+        Besides the state of the content, the page depends on the feed (the previous and the next articles),
+        the user (their name is shown in the header) and their CSRF token, the time zone and the URL.
+
+        Args:
+            state (dict): The state of the content.
+            feed_version (int): The current version of the feed.
+
+        Returns:
+            str: The quoted ETag.
+        """
+
+        request = self.request
+        user_key = ''
+        if request.user.is_authenticated:
+            user_key = f'{request.user.pk}:{request.user.author}:{request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")}'
+        parts = [
+            state['version'],
+            feed_version,
+            user_key,
+            timezone.get_current_timezone_name(),
+            request.get_host(),
+            request.path,
+            request.GET.urlencode(),
+        ]
+        return f'"{md5(":".join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()}"'
+
+    def get_queryset(self):
+        """
+        Returns the queryset of the content objects with their authors and users joined in the same query.
+
+        Returns:
+            QuerySet: The queryset of the content objects.
+        """
+
+        return super().get_queryset().select_related('author__user')
 
     def get_context_data(self, **kwargs):
         """
         Returns the context data for rendering the content view, including the comment form,
         comments, comments count, and the page number from which the user accessed the content.
+        The previous and the next articles are fetched in one query and cached until the feed changes.
 
         Returns:
             dict: The context data.
         """
 
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comment_set.all()
-        context['comments_count'] = context['comments'].count()
-        context['form'] = CommentForm()
-        context['feed_page'] = self.request.GET.get('page')
-
-        content = self.object
-        queryset = self.get_queryset()
-        prev_content = (
-            queryset
-            .filter(date_time_create__lt=content.date_time_create, is_published=True)
-            .order_by('-date_time_create')
-            .first()
-        )
+        context['comments'] = self.get_comments_queryset()
+        context.update(self.get_page_context(get_content_neighbours(self.object)))
+        return context
 
-        next_content = (
-            queryset
-            .filter(date_time_create__gt=content.date_time_create, is_published=True)
-            .order_by('date_time_create')
-            .first()
-        )
+    def get_comments_queryset(self):
+        """
+        Returns the queryset of the comments of the content with their authors, oldest first.
 
-        context['prev_content'] = prev_content
-        context['next_content'] = next_content
-        context['has_prev_content'] = bool(prev_content)
-        context['has_next_content'] = bool(next_content)
+        Returns:
+            QuerySet: The queryset of the comments.
+        """
 
-        return context
+        return self.object.comment_set.select_related('author__user').order_by('date_time_create')
+
+    def get_page_context(self, neighbours):
+        """
+        Returns the context data of the content page that does not need database queries.
+
+        Args:
+            neighbours (tuple): The previous and the next contents.
+
+        Returns:
+            dict: The context data.
+        """
+
+        prev_content, next_content = neighbours
+        return {
+            'comments_count': self.object.comment_count,
+            'form': CommentForm(),
+            'feed_page': self.request.GET.get('page'),
+            'prev_content': prev_content,
+            'next_content': next_content,
+            'has_prev_content': bool(prev_content),
+            'has_next_content': bool(next_content),
+        }
 
     def post(self, request, *args, **kwargs):
         """
         Handles the HTTP POST request for adding comments to the content.
+        The comment is saved in one transaction with the update of the comment counter of the content.
         Processes the page data to ensure the correct transfer of the last page number in the 'page' query parameter.
 
         Args:
@@ -573,7 +871,8 @@ class ContentView(AuthenticationRedirectMixin, DetailView):
             comment = form.save(commit=False)
             comment.content = content
             comment.author = request.user.author
-            comment.save()
+            with transaction.atomic():
+                comment.save()
 
             return redirect(f"{url}?{params}")
 
@@ -708,7 +1007,8 @@ class CreateContentView(CreateAuthorMixin, CreateView):
 
         If the user is not a superuser and has submitted content within the cooldown period,
         display an error message and invalidate the form submission. Otherwise, associate
-        the content with the author and save it to the database.
+        the content with the author and save it to the database. The time of the last post is read
+        from the database, since the author of the request may come from the cache.
 
         Args:
             form (Form): The submitted form instance.
@@ -718,8 +1018,9 @@ class CreateContentView(CreateAuthorMixin, CreateView):
         """
 
         author = self.request.user.author
-        if not self.request.user.is_superuser and author.date_time_last_post:
-            cooldown_end = author.date_time_last_post + self.cooldown_period
+        last_post_time = None if self.request.user.is_superuser else author.get_last_post_time()
+        if last_post_time:
+            cooldown_end = last_post_time + self.cooldown_period
             if cooldown_end > timezone.now():
                 cooldown_remaining = (cooldown_end - timezone.now()).total_seconds() // 60
                 message = f"You can post content again in {int(cooldown_remaining)} minutes."
@@ -727,12 +1028,8 @@ class CreateContentView(CreateAuthorMixin, CreateView):
                 return self.form_invalid(form)
 
         form.instance.author = author
-        response = super().form_valid(form)
-
-        author.date_time_last_post = timezone.now()
-        author.save()
-
-        return response
+        # The author's last post and last activity are recorded by the post_save signal of the content
+        return super().form_valid(form)
 
 
 class UpdateContentView(CreateAuthorMixin, UpdateView):
@@ -782,7 +1079,10 @@ def change_content_status(request, slug, publish):
         - HttpResponse: A redirect response to the specified next URL.
     """
 
-    content = get_object_or_404(Content, slug=slug, author=request.user.author)
+    author = request.user.author
+    content = get_object_or_404(Content, slug=slug, author=author)
+    # The content is filtered by its author, so the activity signal reuses the loaded author
+    content.author = author
 
     if publish:
         content.publish()
@@ -11,6 +11,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+import dotenv
+
+dotenv.load_dotenv()
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogblog.settings')
 
 application = get_asgi_application()
@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+# Cache backends that count their hits and misses, reported by "python manage.py cache_health".
+# The counts are kept in memory and added to counters stored in the cache itself at most once per
+# STATS_FLUSH_INTERVAL seconds, so the reads do not pay for an extra write each, and the counters of all
+# the processes that share the cache add up. The counts of the last interval of a process may be lost when it exits.
+
+STATS_FLUSH_INTERVAL = 10
+STATS_KEYS = {'hits': 'cache-stats:hits', 'misses': 'cache-stats:misses'}
+
+
+class CountingCacheMixin:
+    """
+    Mixin for a cache backend that counts the hits and the misses of its reads.
+
+    Methods:
+        - get(key, default=None, version=None): Returns the cached value and counts a hit or a miss.
+        - get_stats(): Returns the hits and the misses counted by all the processes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counts = dict.fromkeys(STATS_KEYS, 0)
+        self._counting = True
+        self._flushed_at = time.monotonic()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version)
+        self._count(value is not self._missing_key)
+        return default if value is self._missing_key else value
+
+    def _count(self, hit, number=1):
+        if not self._counting:
+            return
+        self._counts['hits' if hit else 'misses'] += number
+        if time.monotonic() - self._flushed_at >= STATS_FLUSH_INTERVAL:
+            self._flush()
+
+    @contextmanager
+    def _uncounted(self):
+        self._counting = False
+        try:
+            yield
+        finally:
+            self._counting = True
+
+    def _flush(self):
+        self._flushed_at = time.monotonic()
+        counts, self._counts = self._counts, dict.fromkeys(STATS_KEYS, 0)
+        with self._uncounted():
+            for name, number in counts.items():
+                if number:
+                    self.add(STATS_KEYS[name], 0, None)
+                    self.incr(STATS_KEYS[name], number)
+
+    def get_stats(self):
+        """
+        Returns the hits and the misses counted by all the processes that share the cache.
+
+        Returns:
+            dict: The 'hits' and the 'misses'.
+        """
+
+        self._flush()
+        with self._uncounted():
+            return {name: self.get(key, 0) for name, key in STATS_KEYS.items()}
+
+
+class CountingLocMemCache(CountingCacheMixin, LocMemCache):
+    pass
+
+
+class CountingFileBasedCache(CountingCacheMixin, FileBasedCache):
+    pass
+
+
+class CountingRedisCache(CountingCacheMixin, RedisCache):
+    """
+    Redis cache backend that counts its hits and misses. Unlike the other backends, its get_many() does not
+    call get(), so it counts the keys itself.
+    """
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        self._count(True, len(values))
+        self._count(False, len(keys) - len(values))
+        return values
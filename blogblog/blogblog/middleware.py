@@ -1,12 +1,54 @@
-from django.http import HttpResponseRedirect
-from django.urls import resolve
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from zoneinfo import available_timezones, ZoneInfo
 
-import pytz
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponseRedirect
+from django.urls import get_resolver
 from django.utils import timezone
-from django.utils.deprecation import MiddlewareMixin
 
+from .routers import replica_reads, request_writes
+
+
+class RequestMiddleware:
+    """
+    Base class for middleware that only looks at the request and works natively in both sync and async modes.
+
+    Unlike MiddlewareMixin, the async path does not run `process_request()` in a thread, so under ASGI
+    the request does not hop between the event loop and the thread pool. `process_request()` must not
+    do blocking I/O.
 
-class RemoveSlashMiddleware:
+    Methods:
+        process_request(request): Returns a response to short-circuit the request, or None to continue.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_request(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.process_request(request) or await self.get_response(request)
+
+    def process_request(self, request):
+        return None
+
+
+class RemoveSlashMiddleware(RequestMiddleware):
     """
     Middleware for removing trailing slashes from URLs.
 
@@ -17,50 +59,296 @@ class RemoveSlashMiddleware:
         get_response (callable): The next middleware or view function in the chain.
 
     Methods:
-        __call__(request): Process the request and return a response.
+        process_request(request): Process the request, returning the redirect or None.
+        get_admin_prefix(): Returns the path prefix of the admin panel.
 
     Note:
         This middleware does not handle URLs generated through AJAX, as it may interfere with AJAX requests.
 
     """
 
-    def __init__(self, get_response):
+    admin_prefix = None
+
+    def process_request(self, request):
         """
-        Initialize the RemoveSlashMiddleware.
+        Process the request.
+
+        If the URL is not for the admin panel and is an XMLHttpRequest (AJAX) request, the trailing slash is removed.
+        Otherwise the request is passed to the next middleware or view function.
+        The cheap checks of the path and the header come first, and the admin panel is recognised by its prefix,
+        so the URL is resolved only once, for the dispatch to the view.
 
         Args:
-            get_response (callable): The next middleware or view function in the chain.
+            request (HttpRequest): The incoming request.
+
+        Returns:
+            HttpResponse: The redirect to the URL without the trailing slash, or None.
+        """
+
+        path = request.path_info
+        if path == '/' or not path.endswith('/') or request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+            return None
+        admin_prefix = self.get_admin_prefix()
+        if admin_prefix and path.startswith(admin_prefix):
+            return None
+        return HttpResponseRedirect(request.path[:-1])
+
+    def get_admin_prefix(self):
+        """
+        Returns the path prefix of the admin panel, e.g. '/demo-blog-admin/', or '' if there is no admin in the URLs.
+
+        The prefix is looked up in the root URL patterns on the first use and kept for the lifetime of the process.
         """
 
+        if self.admin_prefix is None:
+            self.admin_prefix = ''
+            for pattern in get_resolver().url_patterns:
+                if getattr(pattern, 'namespace', None) == 'admin':
+                    self.admin_prefix = f'/{pattern.pattern}'
+                    break
+        return self.admin_prefix
+
+
+@lru_cache(maxsize=None)
+def get_timezone_names():
+    """
+    Returns the names of the time zones available on the system, read once per process.
+    """
+
+    return frozenset(available_timezones())
+
+
+@lru_cache(maxsize=128)
+def get_timezone(name):
+    """
+    Returns the time zone with the given IANA name, or None if there is no such time zone.
+
+    The name comes from a cookie, so anything is possible: it is checked against the available time zones
+    before a zone file is opened. The time zones and the rejected names are kept in a bounded LRU cache.
+
+    Args:
+        name (str): The name of the time zone, e.g. 'Europe/Berlin'.
+
+    Returns:
+        ZoneInfo: The time zone, or None.
+    """
+
+    if name not in get_timezone_names():
+        return None
+    return ZoneInfo(name)
+
+
+class TimezoneMiddleware(RequestMiddleware):
+    """
+    Middleware that activates the time zone of the user, set by the browser in the 'timezone' cookie.
+
+    Without the cookie or with an invalid one, the default time zone (UTC, see TIME_ZONE) is used.
+
+    Methods:
+        process_request(request): Activates the time zone of the request.
+    """
+
+    def process_request(self, request):
+        tz = get_timezone(request.COOKIES.get('timezone', ''))
+        if tz is None:
+            timezone.deactivate()
+        else:
+            timezone.activate(tz)
+
+
+class ConnectionMetricsMiddleware:
+    """
+    Middleware that reports the database work of each request in the Server-Timing header.
+
+    The header contains the number and the total duration of the queries of the request and whether the request
+    reused a persistent connection or had to open a new one, e.g.
+    `Server-Timing: db;dur=4.2;desc="3 queries", db-connection;desc="new"`, and the replicas that were read,
+    e.g. `db-alias;desc="replica1"`. The browser developer tools show it next to the timings of the response.
+    The queries are counted in whichever thread they run, including the sync_to_async threads of the async views
+    and of the sync views served under ASGI. Enabled by the DB_METRICS setting.
+
+    Attributes:
+        get_response (callable): The next middleware or view function in the chain.
+
+    Methods:
+        __call__(request): Process the request and add the header to the response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DB_METRICS:
+            raise MiddlewareNotUsed
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_metrics, dispatch_uid='install_query_metrics')
+        # The connections of this thread may have been opened before the middleware was loaded
+        for conn in connections.all(initialized_only=True):
+            install_query_metrics(None, conn)
 
     def __call__(self, request):
-        """
-        Process the request and return a response.
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = QueryMetrics()
+        with metrics.activate():
+            response = self.get_response(request)
+        return self.add_header(response, metrics)
 
-        If the URL is not for the admin panel and is an XMLHttpRequest (AJAX) request, the trailing slash is removed.
-        The modified request is then passed to the next middleware or view function.
+    async def __acall__(self, request):
+        metrics = QueryMetrics()
+        with metrics.activate():
+            response = await self.get_response(request)
+        return self.add_header(response, metrics)
 
-        Args:
-            request (HttpRequest): The incoming request.
+    @staticmethod
+    def add_header(response, metrics):
+        queries = 'query' if metrics.count == 1 else 'queries'
+        timings = [f'db;dur={metrics.duration * 1000:.1f};desc="{metrics.count} {queries}"']
+        if metrics.count:
+            timings.append(f'db-connection;desc="{"new" if metrics.opened else "reused"}"')
+        if metrics.aliases - {'default'}:
+            timings.append(f'db-alias;desc="{", ".join(sorted(metrics.aliases))}"')
+        if response.has_header('Server-Timing'):
+            timings.insert(0, response.headers['Server-Timing'])
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware that lets the read-only views read from the replicas (see blogblog/routers.py).
+
+    A GET or HEAD request to a view with `use_read_replica = True` reads the blog models from a replica,
+    unless the user wrote recently. After a request that wrote to the database (see ReplicaRouter.db_for_write()),
+    the user reads from the primary for DB_REPLICA_PIN_SECONDS, so they see their own comment or article.
+    The user is pinned with a cookie, so the other users keep reading from the replicas. Requests that wrote
+    nothing, such as failed logins and CSRF failures, do not pin. Enabled when DB_REPLICA_HOSTS is set.
+
+    Attributes:
+        get_response (callable): The next middleware or view function in the chain.
+
+    Methods:
+        __call__(request): Process the request and pin the reads of the user to the primary after a write.
+        process_view(request, view_func, view_args, view_kwargs): Enables the replica reads for the view.
+    """
+
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'primary_db'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = set()
+        reads_token, writes_token = replica_reads.set(False), request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(reads_token)
+            request_writes.reset(writes_token)
+        return self.pin_after_write(response, writes)
+
+    async def __acall__(self, request):
+        writes = set()
+        reads_token, writes_token = replica_reads.set(False), request_writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(reads_token)
+            request_writes.reset(writes_token)
+        return self.pin_after_write(response, writes)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Enables the replica reads for a safe request to a read-only view, unless the user has written recently.
 
         Returns:
-            HttpResponse: The response generated by the view or the next middleware.
+            None
         """
 
-        url_name = resolve(request.path_info).namespace
-        if url_name != 'admin' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            if request.path != '/' and request.path.endswith('/'):
-                return HttpResponseRedirect(request.path[:-1])
-        response = self.get_response(request)
+        view_class = getattr(view_func, 'view_class', None)
+        if (request.method in self.safe_methods and getattr(view_class, 'use_read_replica', False)
+                and self.cookie_name not in request.COOKIES):
+            replica_reads.set(True)
+        return None
+
+    def pin_after_write(self, response, writes):
+        if writes:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=settings.DB_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
         return response
 
 
-class TimezoneMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        tzname = request.COOKIES.get('timezone')
-        if tzname:
-            timezone.activate(pytz.timezone(tzname))
-        else:
-            timezone.deactivate()
+# The metrics of the current request. The threads of sync_to_async run in a copy of the context of the caller,
+# so the queries of the async ORM and of the sync views served under ASGI are recorded in the metrics of their request
+query_metrics = ContextVar('query_metrics', default=None)
+
+
+class QueryMetrics:
+    """
+    Counts and times the queries of a request on all the databases.
+
+    Methods:
+        - activate(): Context manager that records the queries of the current context in these metrics.
+        - record(alias, duration): Records a query.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.opened = set()
+        self.aliases = set()
+
+    @contextmanager
+    def activate(self):
+        token = query_metrics.set(self)
+        try:
+            yield
+        finally:
+            query_metrics.reset(token)
+
+    def record(self, alias, duration):
+        self.aliases.add(alias)
+        self.count += 1
+        self.duration += duration
+
+
+def install_query_metrics(sender, connection, **kwargs):
+    """
+    Receiver of the connection_created signal that adds the `record_query()` execute wrapper to the connection
+    once, and marks the connection as opened by the current request.
+
+    The wrapper stays on the thread's connection object, whose persistent connection may serve many requests.
+    """
+
+    metrics = query_metrics.get()
+    if metrics is not None:
+        metrics.opened.add(connection.alias)
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper that records the query in the metrics of the current request, if there are any.
+    """
 
+    metrics = query_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record(context['connection'].alias, time.perf_counter() - started)
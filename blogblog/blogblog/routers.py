@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+# True while a read-only view that may read from the replicas is running, see ReplicaRoutingMiddleware
+replica_reads = ContextVar('replica_reads', default=False)
+
+# The labels of the models written during the current request, collected by ReplicaRouter.db_for_write(),
+# so that ReplicaRoutingMiddleware pins the user to the primary only after a request that actually wrote.
+# A mutable set, so that the writes in the threads of sync_to_async reach the middleware.
+request_writes = ContextVar('request_writes', default=None)
+
+# The sessions are written by many requests that change nothing the replicas serve
+UNPINNED_APPS = {'sessions'}
+
+# The lag of a streaming replica in seconds. A replica that has replayed everything it received is not lagging,
+# even if the primary has not written anything for a while (then the last replay timestamp is old).
+# NULL on a server that is not a replica.
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+_lag_lock = threading.Lock()
+_lag_checked_at = {}
+_replica_healthy = {}
+
+
+def get_replica_lag(alias):
+    """
+    Returns the replication lag of the replica in seconds.
+
+    Only PostgreSQL reports the lag; replicas on other databases (e.g. SQLite files in a local setup) are never lagging.
+
+    Args:
+        alias (str): The alias of the replica database.
+
+    Returns:
+        float: The lag in seconds.
+    """
+
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def is_replica_healthy(alias):
+    """
+    Returns True if the replica is available and its lag does not exceed DB_REPLICA_MAX_LAG.
+
+    The lag is checked at most once per DB_REPLICA_LAG_CHECK_INTERVAL seconds per process,
+    the result is reused in between.
+
+    Args:
+        alias (str): The alias of the replica database.
+
+    Returns:
+        bool: True if the replica may be read from.
+    """
+
+    now = time.monotonic()
+    with _lag_lock:
+        checked_at = _lag_checked_at.get(alias)
+        due = checked_at is None or now - checked_at >= settings.DB_REPLICA_LAG_CHECK_INTERVAL
+        if due:
+            # Other threads keep using the previous result instead of checking at the same time
+            _lag_checked_at[alias] = now
+    if due:
+        try:
+            _replica_healthy[alias] = get_replica_lag(alias) <= settings.DB_REPLICA_MAX_LAG
+        except DatabaseError:
+            _replica_healthy[alias] = False
+    return _replica_healthy.get(alias, False)
+
+
+class ReplicaRouter:
+    """
+    Database router that sends the reads of the read-only views to the replicas.
+
+    Only the blog models are read from the replicas, and only while `replica_reads` is set by
+    ReplicaRoutingMiddleware for a safe request to a view with `use_read_replica = True`. Sessions,
+    users and all writes stay on the primary ('default'). A replica that is lagging or unavailable is skipped;
+    if there is no healthy replica, the primary is read.
+
+    Methods:
+        - db_for_read(model, **hints): Returns a healthy replica or None for the primary.
+        - db_for_write(model, **hints): Records the write for the current request and returns the primary.
+        - allow_relation(obj1, obj2, **hints): Allows relations between the objects of the primary and the replicas.
+        - allow_migrate(db, app_label, model_name=None, **hints): Forbids migrations on the replicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not replica_reads.get() or model._meta.app_label != 'blog':
+            return None
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if is_replica_healthy(alias)]
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        writes = request_writes.get()
+        if writes is not None and model._meta.app_label not in UNPINNED_APPS:
+            writes.add(model._meta.label)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
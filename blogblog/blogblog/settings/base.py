@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blogblog.middleware.ConnectionMetricsMiddleware',
+    'blogblog.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,9 +95,132 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        # Connections are kept open between requests for DB_CONN_MAX_AGE seconds (0 closes them after each request)
+        # and checked before reuse, so a connection dropped by the server does not fail the next request
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# 'pgbouncer' when DB_HOST points to PgBouncer in transaction pooling mode: server-side cursors do not survive
+# between transactions there, and startup options are rejected, so the statement timeout has to be set
+# for the database role instead (ALTER ROLE ... SET statement_timeout)
+DB_POOLER = config('DB_POOLER', default='')
+# Queries running longer than this number of milliseconds are cancelled by the server (0 disables the limit).
+# It is shorter than the gunicorn timeout, so a slow query fails the request instead of killing the worker.
+DB_STATEMENT_TIMEOUT = config('DB_STATEMENT_TIMEOUT', default=25000, cast=int)
+
+if DB_POOLER == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_STATEMENT_TIMEOUT:
+    # Sent in the startup packet, so it costs no extra round trip per connection
+    DATABASES['default']['OPTIONS']['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+
+# Read replicas: comma-separated hosts of streaming replicas of the default database, with the same name,
+# credentials and port. The reads of the feed and the articles go to a random replica whose lag is at most
+# DB_REPLICA_MAX_LAG seconds (checked every DB_REPLICA_LAG_CHECK_INTERVAL seconds per process), everything else
+# to the primary. After a write the reads of the user go to the primary for DB_REPLICA_PIN_SECONDS, which should be longer
+# than the lag allowed plus the check interval (see blogblog/routers.py and ReplicaRoutingMiddleware).
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+DB_REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=5, cast=float)
+DB_REPLICA_LAG_CHECK_INTERVAL = config('DB_REPLICA_LAG_CHECK_INTERVAL', default=5, cast=float)
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=15, cast=int)
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests read the replicas through the connections to the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['blogblog.routers.ReplicaRouter']
+
+# Adds the number and the duration of the database queries of each request to the Server-Timing header
+DB_METRICS = config('DB_METRICS', default=False, cast=bool)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# CACHE_BACKEND selects the backend of all the named caches: 'locmem' (per process), 'file' (shared by the
+# processes of one host, CACHE_LOCATION is the directory) or 'redis' (shared by all hosts, CACHE_LOCATION is
+# the URL of a Redis-compatible server). Each named cache gets its own key prefix, CACHE_VERSION invalidates
+# all the keys at once.
+
+# The Django cache backends that also count their hits and misses (see blogblog/caches.py)
+CACHE_BACKENDS = {
+    'locmem': 'blogblog.caches.CountingLocMemCache',
+    'file': 'blogblog.caches.CountingFileBasedCache',
+    'redis': 'blogblog.caches.CountingRedisCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+CACHE_KEY_PREFIX = config('CACHE_KEY_PREFIX', default='blogblog')
+CACHE_VERSION = config('CACHE_VERSION', default=1, cast=int)
+
+
+def cache_settings(alias, timeout, backend=CACHE_BACKEND, base_location=CACHE_LOCATION):
+    """
+    Returns the settings of a named cache for the configured cache backend.
+
+    Args:
+        alias (str): The name of the cache.
+        timeout (int): The default timeout of the cache keys in seconds.
+        backend (str): The cache backend, CACHE_BACKEND by default (the tests check the other backends).
+        base_location (str): The directory or the URL of the cache, CACHE_LOCATION by default.
+
+    Returns:
+        dict: The settings of the cache.
+    """
+    if backend == 'file':
+        location = os.path.join(base_location or BASE_DIR / 'cache', alias)
+    elif backend == 'redis':
+        location = base_location or 'redis://127.0.0.1:6379/0'
+    else:
+        location = alias
+    return {
+        'BACKEND': CACHE_BACKENDS[backend],
+        'LOCATION': location,
+        'TIMEOUT': timeout,
+        'KEY_PREFIX': f'{CACHE_KEY_PREFIX}:{alias}',
+        'VERSION': CACHE_VERSION,
+    }
+
+
+CACHE_TIMEOUTS = {
+    'default': 60 * 5,
+    'fragments': 60 * 60 * 24,
+    'sessions': 60 * 60 * 24 * 14,
+    'ratelimit': 60,
+}
+CACHES = {alias: cache_settings(alias, timeout) for alias, timeout in CACHE_TIMEOUTS.items()}
+
+# Sessions are read from the cache and written through to the database. A per-process cache would keep a session
+# that was logged out in another process, so with 'locmem' the sessions are read from the database
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.' + ('db' if CACHE_BACKEND == 'locmem' else 'cached_db')
+)
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Authentication
+# The backends cache the user and their author loaded for every request. The users log in with their email,
+# the admin panel with the username.
+
+AUTHENTICATION_BACKENDS = [
+    'blog.backends.EmailBackend',
+    'blog.backends.CachedModelBackend',
+]
+
+# The user is cached only in a cache shared by all the processes (not 'locmem'): the changes of a user,
+# such as a new password or the deactivation, invalidate only the cache of the process that made them
+USER_CACHE = config('USER_CACHE', default=CACHE_BACKEND != 'locmem', cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -138,6 +263,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGOUT_REDIRECT_URL = '/login'
 
+# Feed pagination: 'cursor' (keyset pagination, no COUNT(*) and OFFSET) or 'page' (numbered pages)
+FEED_PAGINATION_MODE = config('FEED_PAGINATION_MODE', default='cursor')
+
+# The PostgreSQL text search configuration of the article search, e.g. 'english' for stemming
+# (the search vectors must be rebuilt after a change, see migration 0011)
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='simple')
+
+# Serve the feed and the article pages with async views (run the project under ASGI, see blogblog/asgi.py)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# The author's last activity is written at most once per this number of minutes (0 writes it on every action)
+AUTHOR_ACTIVITY_THROTTLE = config('AUTHOR_ACTIVITY_THROTTLE', default=5, cast=int)
+
+# Background tasks (see blog/tasks.py): 'sync' (after the commit, in the request),
+# 'thread' (in-process thread pool) or 'db' (stored in the database and run by "manage.py run_worker")
+TASKS_MODE = config('TASKS_MODE', default='thread')
+TASKS_WORKERS = config('TASKS_WORKERS', default=2, cast=int)
+TASKS_QUEUE_SIZE = config('TASKS_QUEUE_SIZE', default=1000, cast=int)
+# Seconds a stopping process waits for its queued tasks
+TASKS_SHUTDOWN_TIMEOUT = config('TASKS_SHUTDOWN_TIMEOUT', default=5, cast=int)
+# Stored tasks are retried after TASKS_RETRY_DELAY seconds, doubled with every failed attempt
+TASKS_MAX_ATTEMPTS = config('TASKS_MAX_ATTEMPTS', default=5, cast=int)
+TASKS_RETRY_DELAY = config('TASKS_RETRY_DELAY', default=10, cast=int)
+
 TINYMCE_DEFAULT_CONFIG = {
     # 'blockquote_enter' is a wonderful custom plugin that had to be created, as the default blockquote tag is buggy
     # and does not properly handle line breaks when pressing Enter.
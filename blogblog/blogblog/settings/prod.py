@@ -2,3 +2,17 @@ from .base import *
 
 DEBUG = False
 
+# Templates are compiled once per process and kept in memory (the cached loader), and the gunicorn master
+# compiles the project templates before forking the workers (see gunicorn.conf.py). The loaders are listed
+# explicitly, so the cache does not depend on DEBUG, and the debug context processor is not run in production.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
@@ -0,0 +1,158 @@
+"""
+Gunicorn configuration for blogblog.
+
+Gunicorn reads this file automatically when it is started from this directory (the one with manage.py).
+The number of workers and threads is derived from the CPU cores available to the process and the profile
+selected by the GUNICORN_PROFILE environment variable:
+
+    - cpu-bound: one sync worker per core plus one; for the cached, render-heavy pages (the default);
+    - io-bound: 2 * cores + 1 workers with 4 threads each; for slow databases and external calls;
+    - low-memory: 2 workers with 4 threads each; for small instances.
+
+Any value can be overridden with GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_WORKER_CLASS, GUNICORN_BIND,
+GUNICORN_MAX_REQUESTS and GUNICORN_PRELOAD. The application is preloaded in the master, so the settings
+(including the TinyMCE scripts read in settings/base.py), the URLs, the models and the compiled templates
+are loaded once and shared with the workers copy-on-write. Workers are recycled after max_requests (with a jitter,
+so they do not restart at once) to release memory that grows with fragmentation.
+
+The boot time and the memory of the master and every worker are logged; "python manage.py benchmark startup"
+compares them between the profiles and with preloading turned off.
+"""
+
+import os
+import time
+
+# The application is preloaded after the configuration and before on_starting(), so the boot time is counted from here
+_config_loaded_at = time.perf_counter()
+
+PROFILES = {
+    'cpu-bound': lambda cores: {'workers': cores + 1, 'threads': 1, 'max_requests': 2000},
+    'io-bound': lambda cores: {'workers': 2 * cores + 1, 'threads': 4, 'max_requests': 2000},
+    'low-memory': lambda cores: {'workers': 2, 'threads': 4, 'max_requests': 500},
+}
+
+
+def _cpu_count():
+    # The cores the process may run on: in a container with a CPU set this is less than os.cpu_count()
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+profile = os.environ.get('GUNICORN_PROFILE', 'cpu-bound')
+if profile not in PROFILES:
+    raise RuntimeError(f'Unknown GUNICORN_PROFILE {profile!r}, expected one of: {", ".join(PROFILES)}')
+_defaults = PROFILES[profile](_cpu_count())
+
+wsgi_app = 'blogblog.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = _env_int('GUNICORN_WORKERS', _defaults['workers'])
+threads = _env_int('GUNICORN_THREADS', _defaults['threads'])
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or ('gthread' if threads > 1 else 'sync')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', _defaults['max_requests'])
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30
+# nginx keeps the connections to the upstream open
+keepalive = 5
+# The heartbeat file of the workers is kept in memory instead of the (possibly slow) container file system
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def memory_usage(pid='self'):
+    """
+    Returns the memory of the process in megabytes.
+
+    PSS (proportional set size) divides the pages shared with other processes between them,
+    so the sum of PSS over the master and the workers is the real memory of the server,
+    and the difference between RSS and PSS shows how much is shared copy-on-write.
+
+    Returns:
+        dict: 'rss', 'pss' and 'shared' in megabytes; only 'rss' if /proc/<pid>/smaps_rollup is not available.
+    """
+
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared'}
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    usage[fields[name]] = usage.get(fields[name], 0) + int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        usage['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def _format_memory(usage):
+    return ', '.join(f'{name} {value:.1f} MB' for name, value in usage.items())
+
+
+def on_starting(server):
+    server.log.info('Profile %s: %s %s worker(s) x %s thread(s), preload %s, max requests %s (+%s jitter)',
+                    profile, workers, worker_class, threads, preload_app, max_requests, max_requests_jitter)
+
+
+def precompile_templates():
+    """
+    Compiles the templates of the project into the cache of the template loader.
+
+    Called in the master after preloading, so the workers inherit the compiled templates instead of
+    compiling them on their first requests. The templates of the third-party apps (the admin) are compiled
+    on demand.
+
+    Returns:
+        int: The number of compiled templates.
+    """
+
+    from pathlib import Path
+
+    from django.conf import settings
+    from django.template import engines, TemplateSyntaxError
+
+    count = 0
+    for backend in engines.all():
+        directories = {Path(directory) for loader in backend.engine.template_loaders
+                       if hasattr(loader, 'get_dirs') for directory in loader.get_dirs()}
+        for directory in directories:
+            if not directory.is_relative_to(settings.BASE_DIR):
+                continue
+            for path in directory.rglob('*.html'):
+                try:
+                    backend.get_template(path.relative_to(directory).as_posix())
+                except TemplateSyntaxError:
+                    continue
+                count += 1
+    return count
+
+
+def when_ready(server):
+    if preload_app:
+        started = time.perf_counter()
+        server.log.info('Compiled %s templates in %.2f s', precompile_templates(), time.perf_counter() - started)
+    server.log.info('Master ready in %.2f s (%s)',
+                    time.perf_counter() - _config_loaded_at, _format_memory(memory_usage()))
+
+
+def pre_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared between processes
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    worker.log.info('Worker %s booted in %.2f s (%s)',
+                    worker.pid, time.perf_counter() - worker.forked_at, _format_memory(memory_usage()))